@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Benchmarks of the vps, vultr and vps-status console scripts
+
+    python benchmarks/run.py [--output FILE] [--compare FILE] [--quick]
+                             [--simulator]
+
+Vultr is replaced by requests_mock, and the 1 request/second throttling of
+the vultr library is disabled, so timings measure the overhead of vps-tools
+itself. With --simulator, provision, wait and wipe also run against the
+local API simulator, which adds latency to each request. Results are stored
+as JSON (by default in benchmarks/results/<commit>.json) so that runs of
+different commits can be compared with --compare
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import os.path
+import platform
+import subprocess
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
+
+import requests_mock  # noqa: E402
+import vps.serializer  # noqa: E402
+import vps.vultr.client  # noqa: E402
+import vps.vultr.key  # noqa: E402
+from invoke import Context  # noqa: E402
+from vps.console import display  # noqa: E402
+from vps.program import vultr  # noqa: E402
+from vps.tool.provision import _VultrProvision  # noqa: E402
+from vps.tool.wait import wait_vultr  # noqa: E402
+from vps.tool.wipe import wipe_vultr  # noqa: E402
+from vps.vultr.query import query  # noqa: E402
+from simulator import Simulator  # noqa: E402
+
+_results_dir = os.path.join(_root, 'benchmarks', 'results')
+# seconds vultr --help may take to start, see tests/program_tests.py
+_startup_budget = float(os.environ.get('VPS_STARTUP_BUDGET', 0.5))
+_help_cmd = [sys.executable, '-c',
+             "from vps.program import vultr; vultr.run(['vultr', '--help'])"]
+
+
+def servers(n):
+    """
+    Response of server.list with n servers, spread over 3 regions and 10 tags
+    """
+    result = {}
+    for i in range(n):
+        subid = str(100000 + i)
+        result[subid] = {
+            'SUBID': subid,
+            'os': 'CentOS 6 x64',
+            'ram': '%d MB' % (512 * (1 + i % 4)),
+            'disk': 'Virtual 20 GB',
+            'main_ip': '10.%d.%d.%d' % (i // 65536, i // 256 % 256, i % 256),
+            'vcpu_count': str(1 + i % 4),
+            'location': ('New Jersey', 'Chicago', 'Dallas')[i % 3],
+            'DCID': str(1 + i % 3),
+            'default_password': 'nreqnusibni',
+            'date_created': '2017-01-%02d 14:45:41' % (1 + i % 28),
+            'pending_charges': '0.01',
+            'status': 'active',
+            'cost_per_month': '5.00',
+            'current_bandwidth_gb': 0,
+            'allowed_bandwidth_gb': '1000',
+            'power_status': 'running',
+            'server_state': 'ok',
+            'VPSPLANID': '1',
+            'label': 'vm%d' % i,
+            'internal_ip': '',
+            'tag': 'tag%d' % (i % 10),
+            'OSID': '127',
+            'APPID': '0',
+        }
+    return result
+
+
+_regions = {'1': {'DCID': '1', 'name': 'New Jersey', 'country': 'US'},
+            '2': {'DCID': '2', 'name': 'Chicago', 'country': 'US'}}
+_plans = {'1': {'VPSPLANID': '1', 'name': 'Starter', 'ram': '512'},
+          '2': {'VPSPLANID': '2', 'name': 'Basic', 'ram': '1024'}}
+_os = {'127': {'OSID': '127', 'name': 'CentOS 6 x64'},
+       '148': {'OSID': '148', 'name': 'Ubuntu 12.04 i386'}}
+
+
+def measure(f, repeat, budget=10.0):
+    """
+    Runs f repeat times and returns statistics of the wall time, in seconds.
+    Slow benchmarks stop repeating once budget seconds have been spent
+    """
+    times = []
+    while len(times) < repeat and (not times or sum(times) < budget):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return {
+        'repeat': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'max': max(times),
+    }
+
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            yield
+
+
+def _no_throttling():
+    # only the time module seen by the vultr library, patching time.sleep
+    # would patch it for everybody
+    no_sleep = SimpleNamespace(time=time.time, sleep=lambda seconds: None)
+    return patch('vultr.utils.time', no_sleep)
+
+
+@contextlib.contextmanager
+def _vultr_mock():
+    vps.vultr.key._api_key = 'BENCHMARK'
+    with requests_mock.mock() as m, _no_throttling():
+        yield m
+
+
+def _quiet_context():
+    ctx = Context()
+    ctx.config.run.echo = False
+    return ctx
+
+
+def bench_import(repeat):
+    cmd = [sys.executable, '-c', 'import vps.program']
+    with open(os.devnull, 'w') as devnull:
+        return {
+            'vps.program': measure(
+                lambda: subprocess.check_call(cmd, cwd=_root), repeat),
+            'vultr --help': measure(
+                lambda: subprocess.check_call(_help_cmd, cwd=_root,
+                                              stdout=devnull), repeat),
+        }
+
+
+def over_budget(results):
+    """
+    Lines about the benchmarks slower than their budget
+    """
+    stats = results['benchmarks']['import']['vultr --help']
+    if stats['median'] <= _startup_budget:
+        return []
+    return ['vultr --help took %.3fs, over the budget of %.3fs' %
+            (stats['median'], _startup_budget)]
+
+
+def bench_server_list(repeat, sizes):
+    result = {}
+    for n in sizes:
+        response = json.dumps(servers(n))
+        with _vultr_mock() as m, _quiet():
+            m.get(requests_mock.ANY, text=response)
+            for fmt in ('table', 'json'):
+                args = ['vultr', '--format', fmt, 'server.list']
+                stats = measure(lambda: vultr.run(args, exit=False), repeat)
+                result['%d servers, %s' % (n, fmt)] = stats
+    return result
+
+
+def bench_query(repeat, n):
+    rows = servers(n)
+    ctx = _quiet_context()
+    criteria = {
+        'none': '',
+        'equality': "{'tag': 'tag3'}",
+        'range': "{'vcpu_count': {'>=': 2}, 'DCID': {'in': ['1', '2']}}",
+        'regex': "{'label': {'re': '^vm1[0-9]*5$'}}",
+    }
+    result = {}
+    with _vultr_mock():
+        for columnar, suffix in ((0, ''), (1, ', columnar')):
+            with patch('vps.vultr.query._columnar_rows', columnar):
+                for name, c in criteria.items():
+                    stats = measure(lambda: query(ctx, lambda v: rows, c),
+                                    repeat)
+                    stats['rows_per_second'] = n / stats['median']
+                    result['%d rows, %s%s' % (n, name, suffix)] = stats
+    return result
+
+
+def bench_display(repeat, n):
+    rows = list(servers(n).values())
+    result = {}
+    with _quiet():
+        for fmt in ('table', 'yaml', 'json', 'csv'):
+            stats = measure(lambda: display(rows, fmt), repeat)
+            stats['rows_per_second'] = n / stats['median']
+            result['%d rows, %s' % (n, fmt)] = stats
+    return result
+
+
+def bench_json(repeat, n):
+    """
+    Standard library against orjson, when installed: decoding a server.list
+    response, writing it to the cache and displaying it as jsonl
+    """
+    response = json.dumps(servers(n)).encode('utf-8')
+    rows = list(servers(n).values())
+    result = {}
+    for name in ('json', 'orjson'):
+        backend = vps.serializer.get_backend(name)
+        if backend.name != name:
+            continue
+        cases = {
+            'decode': lambda: backend.loads(response),
+            'encode': lambda: backend.dumps({'created': 0, 'data': rows}),
+            'jsonl': lambda: display(rows, 'jsonl'),
+        }
+        with patch('vps.serializer._backend', backend), _quiet():
+            for case, f in cases.items():
+                stats = measure(f, repeat)
+                stats['rows_per_second'] = n / stats['median']
+                result['%d servers, %s, %s' % (n, case, name)] = stats
+    return result
+
+
+class _Provision(_VultrProvision):
+
+    def __init__(self, ctx, cfg, **kwargs):
+        self.cfg = cfg
+        super(_Provision, self).__init__(ctx, **kwargs)
+
+    def _read_cfg(self):
+        return self.cfg
+
+    def run(self):
+        # the servers created are not recorded in ~/.vps
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('vps.tool.provision._state_path',
+                      os.path.join(tmp, 'provisioned.json')):
+            return super(_Provision, self).run()
+
+
+def _provision_cfg(n):
+    vm = '%s:\n  region:\n    name: New Jersey\n  plan:\n    name: Starter\n' \
+        '  os:\n    name: CentOS 6 x64\n'
+    return ''.join(vm % ('vm%d' % i) for i in range(n))
+
+
+def bench_provision(repeat, sizes, jobs=10):
+    # server.list is only queried to check a failed create
+    routes = {'/v1/regions/list': _regions, '/v1/plans/list': _plans,
+              '/v1/os/list': _os, '/v1/server/list': {}}
+
+    def _callback_query(request, context):
+        return json.dumps(routes[request.path])
+
+    result = {}
+    for n in sizes:
+        cfg = _provision_cfg(n)
+        with _vultr_mock() as m:
+            m.get(requests_mock.ANY, text=_callback_query)
+            m.post(requests_mock.ANY, text='{"SUBID": "1312965"}')
+
+            def _run():
+                _Provision(_quiet_context(), cfg, jobs=jobs, rate=None).run()
+
+            result['%d vms, %d jobs' % (n, jobs)] = measure(_run, repeat)
+    return result
+
+
+@contextlib.contextmanager
+def _simulated(**kwargs):
+    simulator = Simulator(**kwargs)
+    server = simulator.serve(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    endpoint = 'http://%s:%d' % server.server_address[:2]
+    vps.vultr.key._api_key = 'BENCHMARK'
+    try:
+        with _no_throttling(), \
+                patch.object(vps.vultr.client, '_endpoint', endpoint), \
+                patch.object(vps.vultr.client, '_clients', {}):
+            yield simulator
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_simulated(repeat, n, latency=0.02, pending=0.5):
+    """
+    provision, wait and wipe of n servers against the simulator
+    """
+    result = {}
+    cfg = _provision_cfg(n)
+    for jobs in (1, 10):
+        times = {'provision': [], 'wait': [], 'wipe': []}
+        with _simulated(latency=latency, pending=pending) as simulator:
+            for _ in range(repeat):
+                ctx = _quiet_context()
+                phases = (
+                    ('provision', lambda: _Provision(ctx, cfg, jobs=jobs,
+                                                     rate=None).run()),
+                    ('wait', lambda: wait_vultr(ctx, interval=0.1,
+                                                max_interval=0.5)),
+                    ('wipe', lambda: wipe_vultr(ctx, jobs=jobs, rate=None)),
+                )
+                for phase, f in phases:
+                    times[phase].append(measure(f, 1)['median'])
+            requests = simulator.requests
+        for phase, values in times.items():
+            result['%d vms, %d jobs, %s' % (n, jobs, phase)] = {
+                'repeat': len(values),
+                'min': min(values),
+                'median': statistics.median(values),
+                'mean': statistics.mean(values),
+                'max': max(values),
+            }
+        result['%d vms, %d jobs, requests' % (n, jobs)] = {
+            'median': requests / float(repeat)}
+    return result
+
+
+def _commit():
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                      cwd=_root, stderr=subprocess.DEVNULL)
+        return out.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(quick=False, simulated=False):
+    repeat = 3 if quick else 10
+    big = 1000 if quick else 10000
+    results = {
+        'commit': _commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'benchmarks': {
+            'import': bench_import(repeat),
+            'server.list': bench_server_list(repeat, (10, 1000, big)),
+            'query': bench_query(repeat, big),
+            'display': bench_display(repeat, big),
+            'json': bench_json(repeat, big),
+            'provision.vultr': bench_provision(repeat, (1, 50, 500)),
+        },
+    }
+    if simulated:
+        results['benchmarks']['simulator'] = bench_simulated(
+            1 if quick else 3, 10 if quick else 50)
+    return results
+
+
+def compare(old, new):
+    """
+    Lines comparing the median times of two runs
+    """
+    lines = []
+    for group, benchmarks in sorted(new['benchmarks'].items()):
+        for name, stats in benchmarks.items():
+            before = old['benchmarks'].get(group, {}).get(name)
+            line = '%-16s %-28s %10.4fs' % (group, name, stats['median'])
+            if before:
+                ratio = stats['median'] / before['median']
+                line += '  %6.2fx  (was %.4fs)' % (ratio, before['median'])
+            lines.append(line)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--output', help='JSON file to store the results in')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    parser.add_argument('--quick', action='store_true',
+                        help='Fewer repetitions and smaller data sets')
+    parser.add_argument('--simulator', action='store_true',
+                        help='Also run provision, wait and wipe against ' +
+                        'the local API simulator')
+    args = parser.parse_args(argv)
+    results = run(quick=args.quick, simulated=args.simulator)
+    output = args.output or os.path.join(_results_dir,
+                                         '%s.json' % results['commit'])
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    old = {'benchmarks': {}}
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+    print('\n'.join(compare(old, results)))
+    print('Results stored in %s' % output)
+    failures = over_budget(results)
+    if failures:
+        print('\n'.join(failures), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
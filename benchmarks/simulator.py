@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Local stand-in for the Vultr API, to load test the CLI offline
+
+    python benchmarks/simulator.py [--port 8080] [--pending 10] [--latency 0.05]
+                                   [--rate 2] [--burst 2] [--error-rate 0.01]
+    export VPS_API_ENDPOINT=http://127.0.0.1:8080
+
+Responses are taken from the cached scenarios of the test suite. Servers are
+stateful: server.create adds them as pending, they become active after
+--pending seconds, server.list returns them and server.destroy removes them.
+Requests over the rate limit get a 503 and a fraction of them, given by
+--error-rate, fail with a 500, like the real API does from time to time
+"""
+
+import argparse
+import json
+import os.path
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
+
+from vps.vultr.ratelimit import TokenBucket  # noqa: E402
+
+_scenarios_file = os.path.join(_root, 'tests', 'cached_scenarios.yaml')
+
+
+def load_responses(path=_scenarios_file):
+    """
+    Responses of the cached scenarios, by API call
+    """
+    import ruamel.yaml
+    with open(path) as f:
+        scenarios = ruamel.yaml.load(f.read(), Loader=ruamel.yaml.Loader)
+    return {api_call: scenario.response
+            for api_call, scenario in scenarios.items()}
+
+
+class _RateLimit(TokenBucket):
+    """
+    Token bucket that rejects requests instead of waiting for a token
+    """
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class Account(object):
+    """
+    Servers of the simulated account. Their status is derived from their age,
+    so no background thread is needed to make them active
+    """
+
+    def __init__(self, template, pending=10.0):
+        self.template = template
+        self.pending = pending
+        self.servers = {}
+        self._next_subid = 1000000
+        self._lock = threading.Lock()
+
+    def create(self, params):
+        with self._lock:
+            self._next_subid += 1
+            subid = str(self._next_subid)
+            n = self._next_subid - 1000000
+            server = dict(self.template)
+            server.update({
+                'SUBID': subid,
+                'DCID': params.get('DCID', server.get('DCID')),
+                'VPSPLANID': params.get('VPSPLANID', server.get('VPSPLANID')),
+                'OSID': params.get('OSID', server.get('OSID')),
+                'label': params.get('label', ''),
+                'tag': params.get('tag', ''),
+                'main_ip': '10.%d.%d.%d' % (n // 65536 % 256, n // 256 % 256,
+                                            n % 256),
+                'date_created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            self.servers[subid] = (time.monotonic(), server)
+        return {'SUBID': subid}
+
+    def destroy(self, subid):
+        with self._lock:
+            return self.servers.pop(subid, None) is not None
+
+    def _with_status(self, created, server):
+        server = dict(server)
+        if time.monotonic() - created < self.pending:
+            server.update(status='pending', power_status='stopped',
+                          server_state='none')
+        else:
+            server.update(status='active', power_status='running',
+                          server_state='ok')
+        return server
+
+    def list(self, params):
+        with self._lock:
+            servers = list(self.servers.values())
+        result = {}
+        for created, server in servers:
+            if any(params.get(k) not in (None, server.get(k))
+                   for k in ('SUBID', 'tag', 'label', 'main_ip')):
+                continue
+            result[server['SUBID']] = self._with_status(created, server)
+        return result
+
+
+class Simulator(object):
+    """
+    Vultr API simulator. latency is added to every response, rate limits the
+    requests per second (None for no limit) and error_rate is the fraction
+    of requests failing with an internal server error
+    """
+
+    def __init__(self, pending=10.0, latency=0.0, rate=None, burst=2,
+                 error_rate=0.0, seed=None, responses=None):
+        self.responses = responses if responses is not None else \
+            load_responses()
+        template = next(iter(json.loads(
+            self.responses['/v1/server/list']).values()))
+        self.account = Account(template, pending)
+        self.latency = latency
+        self.limit = _RateLimit(rate, burst) if rate else None
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        # requests are handled by one thread each
+        self._lock = threading.Lock()
+
+    def handle(self, method, path, params):
+        """
+        Returns the status code and body of the response to a request
+        """
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate and self.random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if self.limit and not self.limit.try_acquire():
+            return 503, 'Rate limit reached'
+        if failed:
+            return 500, 'Internal server error'
+        if path == '/v1/server/list' and method == 'GET':
+            return 200, json.dumps(self.account.list(params))
+        if path == '/v1/server/create' and method == 'POST':
+            return 200, json.dumps(self.account.create(params))
+        if path == '/v1/server/destroy' and method == 'POST':
+            if self.account.destroy(params.get('SUBID')):
+                return 200, ''
+            return 412, 'Invalid server.  Check SUBID value and ensure ' + \
+                'your API key matches the server\'s account'
+        response = self.responses.get(path)
+        if response is None:
+            return 404, 'Unknown API call %s' % path
+        return 200, response
+
+    def serve(self, host='127.0.0.1', port=8080):
+        """
+        HTTP server for the simulator. Call serve_forever() on it, or
+        shutdown() to stop it when running in a thread
+        """
+        simulator = self
+
+        class _Handler(BaseHTTPRequestHandler):
+
+            def _respond(self, method):
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                if method == 'POST':
+                    length = int(self.headers.get('Content-Length') or 0)
+                    body = self.rfile.read(length).decode()
+                    params.update(parse_qsl(body))
+                status, text = simulator.handle(method, url.path, params)
+                body = text.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--pending', type=float, default=10.0,
+                        help='Seconds until a new server becomes active')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to every response')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Requests per second before answering 503')
+    parser.add_argument('--burst', type=int, default=2,
+                        help='Requests allowed at once by the rate limit')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests failing with a 500')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    simulator = Simulator(pending=args.pending, latency=args.latency,
+                          rate=args.rate, burst=args.burst,
+                          error_rate=args.error_rate, seed=args.seed)
+    server = simulator.serve(args.host, args.port)
+    print('export VPS_API_ENDPOINT=http://%s:%d' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -34,14 +34,18 @@ vps provision.vultr
 
 echo "Wait to get the server ready..."
 echo ""
-sleep 90
+vps wait.vultr || exit -1
+
+echo "Fetch the server list"
+echo ""
+vps inventory.refresh || exit -1
 
 echo "Load server keys in known_hosts file"
 echo ""
-ssh-keyscan -t ecdsa `vps ssh.list` >> $HOME/.ssh/known_hosts
+vps ssh.keyscan --max-age 300 || exit -1
 
 echo "Create roster file"
 echo ""
-vps salt.roster > $HOME/Projects/salt-etc/etc/salt/roster
+vps salt.roster --max-age 300 --output $HOME/Projects/salt-etc/etc/salt/roster
 
 echo "Enjoy your server"
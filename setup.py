@@ -54,12 +54,17 @@ setup(
     license="BSD",
     keywords="vps vultr cli",
     url="https://github.com/germfue/vps-tools.git",
+    python_requires='>=3.7',
     install_requires=[
         'invoke',
         'vultr',
         'clint',
         'ruamel.yaml',
     ],
+    extras_require={
+        # faster JSON decoding and encoding, see vps.serializer
+        'fast': ['orjson'],
+    },
     tests_require=[
         'beautifulsoup4',
         'requests',
@@ -81,5 +86,11 @@ setup(
         "Topic :: System :: Systems Administration",
         "License :: OSI Approved :: BSD License",
         "Environment :: Console",
+        "Programming Language :: Python :: 3 :: Only",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
     ],
 )
@@ -31,8 +31,14 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import io
+import json
+import ruamel.yaml
 import unittest
-from vps.console import get_headers, column_size
+import vps.console
+from invoke import Config, Context
+from unittest.mock import patch
+from vps.console import get_headers, column_size, display, get_format
 
 
 class TestDisplay(unittest.TestCase):
@@ -77,3 +83,79 @@ class TestDisplay(unittest.TestCase):
         matrix = [{'k0': False}]
         csize = column_size(matrix[0].keys(), matrix)
         self.assertEqual(csize['k0'], 5)
+
+
+class TestStreamingDisplay(unittest.TestCase):
+
+    def _rows(self, n, consumed):
+        for i in range(n):
+            consumed.append(i)
+            yield {'SUBID': str(i), 'label': 'server%d' % i}
+
+    @patch('vps.console.console_width', return_value=80)
+    @patch('vps.console.puts')
+    def test_table_streamed(self, mock_puts, mock_width):
+        consumed = []
+        lines = []
+
+        def _puts(line, newline=True):
+            # rows past the sample are written as soon as they are read
+            lines.append((line, len(consumed)))
+        mock_puts.side_effect = _puts
+        n = vps.console._sample_size + 50
+        display(self._rows(n, consumed))
+        self.assertEqual(n + 1, len(lines))
+        self.assertIn('SUBID', lines[0][0])
+        self.assertEqual(n - 1, lines[-2][1])
+        self.assertTrue(lines[-1][0].startswith('149'))
+
+    @patch('vps.console.console_width', return_value=10)
+    @patch('vps.console.puts')
+    def test_yaml_per_item(self, mock_puts, mock_width):
+        consumed = []
+        display(self._rows(3, consumed))
+        self.assertEqual(3, mock_puts.call_count)
+        output = ''.join(c[0][0] for c in mock_puts.call_args_list)
+        docs = ruamel.yaml.load(output, Loader=ruamel.yaml.Loader)
+        self.assertEqual({'SUBID': '2', 'label': 'server2'}, docs['server2'])
+
+
+class TestFormats(unittest.TestCase):
+
+    _rows = [{'SUBID': '1', 'label': 'a,b'}, {'SUBID': '2', 'label': 'c', 'tag': 't'}]
+
+    def _display(self, fmt):
+        with patch('sys.stdout', new_callable=io.StringIO) as out:
+            display(iter(self._rows), fmt)
+            return out.getvalue()
+
+    def test_get_format(self):
+        self.assertEqual('table', get_format(Context()))
+        ctx = Context(Config(overrides={'output': {'format': 'jsonl'}}))
+        self.assertEqual('jsonl', get_format(ctx))
+
+    def test_jsonl(self):
+        lines = self._display('jsonl').splitlines()
+        self.assertEqual(self._rows, [json.loads(line) for line in lines])
+
+    def test_json(self):
+        self.assertEqual(self._rows, json.loads(self._display('json')))
+
+    def test_csv(self):
+        output = self._display('csv')
+        self.assertEqual('SUBID,label,tag\n1,"a,b",\n2,c,t\n', output)
+
+    def test_tsv(self):
+        output = self._display('tsv')
+        self.assertEqual('SUBID\tlabel\ttag\n1\ta,b\t\n2\tc\tt\n', output)
+
+    def test_json_ascii_stdout(self):
+        rows = [{'SUBID': '1', 'label': 'café'}]
+        for backend in ('json', 'orjson'):
+            out = io.TextIOWrapper(io.BytesIO(), encoding='ascii')
+            with patch('vps.serializer._backend', None), \
+                    patch('vps.serializer._preferred', backend), \
+                    patch('sys.stdout', out):
+                display(iter(rows), 'json')
+                out.seek(0)
+                self.assertEqual(rows, json.loads(out.read()))
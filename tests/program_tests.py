@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import contextlib
+import io
+import json
+import os.path
+import pstats
+import requests_mock
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import vps.vultr.key
+from unittest.mock import patch
+from vps.profiling import phase, timed
+from vps.program import vultr, vps as vps_program
+
+_heavy = ('requests', 'vultr', 'ruamel.yaml', 'clint')
+
+
+def _loaded_modules(code):
+    script = code + '\nimport sys\nprint(" ".join(sys.modules))'
+    out = subprocess.check_output([sys.executable, '-c', script])
+    return set(out.decode().split())
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_program(self):
+        modules = _loaded_modules('import vps.program')
+        for module in _heavy + ('vps.vultr.tasks', 'vps.tool.tasks'):
+            self.assertNotIn(module, modules)
+
+    def test_collections(self):
+        modules = _loaded_modules(
+            'import vps.status, vps.vultr.tasks, vps.tool.tasks')
+        for module in _heavy:
+            self.assertNotIn(module, modules)
+
+    def test_only_own_collection(self):
+        modules = _loaded_modules('import vps.program\n' +
+                                  'vps.program.vultr.namespace')
+        self.assertIn('vps.vultr.tasks', modules)
+        self.assertNotIn('vps.tool.tasks', modules)
+
+    def test_profilers_not_imported(self):
+        modules = _loaded_modules('import vps.program\n' +
+                                  'vps.program.vultr.run(["vultr", "-l"])')
+        for module in ('cProfile', 'pstats', 'tracemalloc'):
+            self.assertNotIn(module, modules)
+
+
+class TestFormatOption(unittest.TestCase):
+
+    def _config(self, *args):
+        configs = []
+        with patch('invoke.Program.execute',
+                   lambda program: configs.append(program.config)):
+            vps_program.run(['vps'] + list(args) + ['ssh.list'], exit=False)
+        return configs[0]
+
+    def test_core_overrides_kept(self):
+        config = self._config('--warn-only', '--dry', '--hide', 'both',
+                              '-o', 'json')
+        self.assertEqual('json', config.output.format)
+        self.assertTrue(config.run.warn)
+        self.assertTrue(config.run.dry)
+        self.assertEqual('both', config.run.hide)
+
+
+class TestProfiling(unittest.TestCase):
+
+    def _run(self, *options):
+        servers = {str(i): {'SUBID': str(i), 'label': 'vm%d' % i}
+                   for i in range(10)}
+        out, err = io.StringIO(), io.StringIO()
+        with requests_mock.mock() as m, contextlib.redirect_stdout(out), \
+                contextlib.redirect_stderr(err), \
+                patch.object(vps.vultr.key, '_api_key', 'EXAMPLE'):
+            m.get(requests_mock.ANY, text=json.dumps(servers))
+            vultr.run(['vultr'] + list(options) + ['-o', 'json', 'server.list'],
+                      exit=False)
+        self.assertEqual(servers, {s['SUBID']: s
+                                   for s in json.loads(out.getvalue())})
+        return err.getvalue()
+
+    def test_disabled(self):
+        self.assertEqual('', self._run())
+        self.assertIs(phase('render'), phase('GET /v1/server/list'))
+
+    def test_timings(self):
+        lines = self._run('--timings', '--memory').splitlines()
+        phases = [line.split()[0] for line in lines]
+        for name in ('config', 'tasks', 'GET', 'render', 'total', 'peak'):
+            self.assertIn(name, phases)
+        self.assertIn('GET /v1/server/list', '\n'.join(lines))
+
+    def test_timed(self):
+
+        def produce():
+            for i in range(3):
+                time.sleep(0.02)
+                yield i
+
+        with patch('vps.profiling._phases', {}) as phases:
+            for _ in timed('GET /v1/server/list', produce()):
+                time.sleep(0.1)
+            calls, seconds = phases['GET /v1/server/list']
+        self.assertEqual(1, calls)
+        # the time spent by the consumer is not counted
+        self.assertTrue(0.06 <= seconds < 0.2, seconds)
+
+    def test_profile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profile = os.path.join(tmp, 'vultr.pstats')
+            stacks = os.path.join(tmp, 'vultr.folded')
+            self._run('--profile', profile, '--profile-stacks', stacks)
+            functions = [f[2] for f in pstats.Stats(profile).stats]
+            self.assertIn('server_list', functions)
+            with open(stacks) as f:
+                lines = f.read().splitlines()
+        self.assertTrue(any('server_list (server.py:' in line
+                            for line in lines))
+        for line in lines:
+            stack, micros = line.rsplit(' ', 1)
+            self.assertGreater(int(micros), 0)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import json
+import unittest
+from unittest.mock import patch
+import vps.serializer
+from vps.serializer import dumps, get_backend, loads
+
+
+_server = {'SUBID': '576965', 'label': 'café', 'ram': 1024, 'cost': 5.0,
+           'auto_backups': False, 'v6_networks': [], 'tag': None}
+
+
+class TestSerializer(unittest.TestCase):
+
+    def test_backends(self):
+        for name in ('json', 'orjson'):
+            backend = get_backend(name)
+            text = backend.dumps({'1': _server})
+            self.assertIsInstance(text, str)
+            self.assertEqual({'1': _server}, json.loads(text))
+            self.assertEqual({'1': _server}, backend.loads(text))
+            self.assertEqual({'1': _server}, backend.loads(text.encode()))
+
+    def test_fallback(self):
+        def missing():
+            raise ImportError('No module named orjson')
+        with patch.dict(vps.serializer._backends, orjson=missing):
+            self.assertEqual('json', get_backend('orjson').name)
+
+    def test_default(self):
+        with patch('vps.serializer._backend', None), \
+                patch('vps.serializer._preferred', 'json'):
+            self.assertEqual(json.dumps(_server), dumps(_server))
+            self.assertEqual(_server, loads(json.dumps(_server)))
+
+    def test_ascii(self):
+        value = {'label': 'café ☃ 😀'}
+        for name in ('json', 'orjson'):
+            text = get_backend(name).dumps(value)
+            self.assertTrue(text.isascii())
+            self.assertEqual(json.dumps(value).replace(' ', ''),
+                             text.replace(' ', ''))
+
+    def test_unsupported_by_orjson(self):
+        dumps = get_backend('orjson').dumps
+        self.assertEqual({'1': 'a'}, json.loads(dumps({1: 'a'})))
+        self.assertEqual([2 ** 70], json.loads(dumps([2 ** 70])))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import json
+import os.path
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import vps.vultr.key
+from vps.vultr.client import get_client
+
+_benchmarks = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'benchmarks')
+if _benchmarks not in sys.path:
+    sys.path.insert(0, _benchmarks)
+
+from simulator import Simulator  # noqa: E402
+
+
+class TestSimulator(unittest.TestCase):
+
+    def test_server_lifecycle(self):
+        simulator = Simulator(pending=0.0)
+        status, body = simulator.handle('POST', '/v1/server/create',
+                                        {'label': 'web1', 'DCID': '1'})
+        self.assertEqual(200, status)
+        subid = json.loads(body)['SUBID']
+        status, body = simulator.handle('GET', '/v1/server/list',
+                                        {'label': 'web1'})
+        server = json.loads(body)[subid]
+        self.assertEqual(('web1', '1', 'active'),
+                         (server['label'], server['DCID'], server['status']))
+        self.assertEqual(200, simulator.handle('POST', '/v1/server/destroy',
+                                               {'SUBID': subid})[0])
+        self.assertEqual({}, json.loads(
+            simulator.handle('GET', '/v1/server/list', {})[1]))
+        self.assertEqual(412, simulator.handle('POST', '/v1/server/destroy',
+                                               {'SUBID': subid})[0])
+
+    def test_pending(self):
+        simulator = Simulator(pending=60.0)
+        simulator.handle('POST', '/v1/server/create', {'label': 'web1'})
+        servers = json.loads(simulator.handle('GET', '/v1/server/list', {})[1])
+        self.assertEqual(['pending'], [s['status'] for s in servers.values()])
+
+    def test_cached_responses(self):
+        simulator = Simulator()
+        status, body = simulator.handle('GET', '/v1/regions/list', {})
+        self.assertEqual(200, status)
+        self.assertTrue(json.loads(body))
+        self.assertEqual(404, simulator.handle('GET', '/v1/unknown', {})[0])
+
+    def test_rate_limit(self):
+        simulator = Simulator(rate=0.001, burst=2)
+        statuses = [simulator.handle('GET', '/v1/regions/list', {})[0]
+                    for _ in range(3)]
+        self.assertEqual([200, 200, 503], statuses)
+
+    def test_error_rate(self):
+        simulator = Simulator(error_rate=1.0)
+        self.assertEqual(500, simulator.handle('GET', '/v1/os/list', {})[0])
+
+    def test_requests_counted_from_threads(self):
+        simulator = Simulator()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(400):
+                executor.submit(simulator.handle, 'GET', '/v1/os/list', {})
+        self.assertEqual(400, simulator.requests)
+
+    def test_http(self):
+        simulator = Simulator(pending=0.0)
+        server = simulator.serve(port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        endpoint = 'http://%s:%d' % server.server_address[:2]
+        try:
+            with patch('vps.vultr.client._endpoint', endpoint), \
+                    patch('vps.vultr.client._clients', {}), \
+                    patch.object(vps.vultr.key, '_api_key', 'EXAMPLE'):
+                vultr = get_client()
+                subid = vultr.server.create('1', '201', '167',
+                                            {'label': 'web1'})['SUBID']
+                self.assertEqual([subid], list(vultr.server.list()))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(2, simulator.requests)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from vps.tool.batch import run_batch
+from vps.vultr.ratelimit import TokenBucket
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_results_by_key(self):
+        items = [('a', 1), ('b', 2), ('c', 3)]
+        results, errors = run_batch(lambda x: x * 10, items, jobs=3)
+        self.assertEqual({'a': 10, 'b': 20, 'c': 30}, results)
+        self.assertEqual(['a', 'b', 'c'], list(results.keys()))
+        self.assertFalse(errors)
+
+    def test_failure_does_not_abort(self):
+        def _f(x):
+            if x == 2:
+                raise ValueError('boom')
+            return x
+        items = [('a', 1), ('b', 2), ('c', 3)]
+        results, errors = run_batch(_f, items, jobs=2)
+        self.assertEqual({'a': 1, 'c': 3}, results)
+        self.assertEqual(['b'], list(errors.keys()))
+        self.assertIn('boom', str(errors['b']))
+
+    def test_jobs_over_pool_size(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def _f(x):
+            with lock:
+                running.append(x)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(x)
+            return x
+        items = [(i, i) for i in range(15)]
+        with patch('vps.vultr.client._pool_size', 10):
+            results, errors = run_batch(_f, items, jobs=15)
+        self.assertEqual(15, len(results))
+        self.assertEqual(15, max(peak))
+
+    def test_rate(self):
+        items = [(i, i) for i in range(4)]
+        start = time.monotonic()
+        run_batch(lambda x: x, items, jobs=4, rate=20)
+        # first token is available right away, the other 3 take 1/20s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.14)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst(self):
+        bucket = TokenBucket(1, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os.path
+import requests_mock
+import tempfile
+import time
+import unittest
+import vps.tool.inventory
+import vps.vultr.key
+from invoke import Context
+from unittest.mock import patch
+from vps.tool.inventory import get_servers, inventory_refresh, invalidate
+from vps.tool.salt import salt_roster
+from vps.tool.ssh import ssh_list
+
+_server_list_response = '''{
+"576965": {
+    "SUBID": "576965",
+    "main_ip": "123.123.123.123",
+    "label": "my_server",
+    "tag": "mytag",
+    "default_password": "nreqnusibni",
+    "kvm_url": "https://my.vultr.com/subs/novnc/api.php?data=eawxFVZw2mXnhGUV"
+    }
+}'''
+
+
+class TestInventory(unittest.TestCase):
+
+    def setUp(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        self.dir = tempfile.TemporaryDirectory()
+        self.snapshots = patch.dict(vps.tool.inventory._snapshots, clear=True)
+        self.snapshots.start()
+
+    def tearDown(self):
+        self.snapshots.stop()
+        self.dir.cleanup()
+
+    def _task_context(self, cache=False):
+        ctx = Context()
+        ctx.config.run.echo = False
+        if cache:
+            ctx.config.cache = {'enabled': True, 'path': self.dir.name}
+        return ctx
+
+    def test_no_key(self):
+        vps.vultr.key._api_key = ''
+        self.assertIsNone(inventory_refresh(self._task_context()))
+
+    def test_snapshot_reused(self):
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            inventory_refresh(ctx)
+            hosts = ssh_list(ctx, max_age=60)
+            roster = salt_roster(ctx, max_age=60)
+            self.assertEqual(1, m.call_count)
+        self.assertEqual(['123.123.123.123 vultr.com,123.123.123.123,my_server'],
+                         hosts)
+        self.assertEqual('123.123.123.123', roster['my_server']['host'])
+
+    def test_no_max_age(self):
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            get_servers(ctx)
+            get_servers(ctx)
+            self.assertEqual(2, m.call_count)
+
+    def test_expired(self):
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            get_servers(ctx)
+            snapshot = vps.tool.inventory._snapshots['EXAMPLE']
+            snapshot['created'] = time.time() - 120
+            get_servers(ctx, max_age=60)
+            self.assertEqual(2, m.call_count)
+
+    def test_snapshot_on_disk(self):
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            inventory_refresh(self._task_context(cache=True))
+            # i.e. the next command, in a new process
+            vps.tool.inventory._snapshots.clear()
+            servers = get_servers(self._task_context(cache=True), max_age=60)
+            self.assertEqual(1, m.call_count)
+        self.assertEqual('576965', servers[0]['SUBID'])
+
+    def test_no_secrets_on_disk(self):
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            servers = inventory_refresh(self._task_context(cache=True))
+        self.assertEqual('nreqnusibni', servers[0]['default_password'])
+        for root, _, files in os.walk(self.dir.name):
+            for name in files:
+                with open(os.path.join(root, name), 'rb') as f:
+                    content = f.read()
+                self.assertNotIn(b'nreqnusibni', content)
+                self.assertNotIn(b'eawxFVZw2mXnhGUV', content)
+        vps.tool.inventory._snapshots.clear()
+        servers = get_servers(self._task_context(cache=True), max_age=60)
+        self.assertNotIn('default_password', servers[0])
+
+    def test_invalidate(self):
+        ctx = self._task_context(cache=True)
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            inventory_refresh(ctx)
+            invalidate(ctx)
+            get_servers(ctx, max_age=60)
+            self.assertEqual(2, m.call_count)
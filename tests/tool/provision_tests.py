@@ -31,14 +31,17 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import json
 import os.path
 import requests_mock
+import tempfile
 import unittest
 import vps.vultr.key
 from invoke import Context
 from unittest.mock import patch
 from urllib.parse import parse_qs
-from vps.tool.provision import provision_vultr, _VultrProvision
+from vps.tool.provision import provision_vultr, _VultrProvision, \
+    _created_servers, _record
 
 
 class use_once(object):
@@ -179,6 +182,32 @@ _cfg_multiple_match = """
         vcpu_count: "1"
     osid: %s
 """ % (_label, _dcid, _osid)
+_cfg_many_vms = """
+vm1:
+    region:
+        name: %s
+    plan:
+        name: %s
+    os:
+        name: %s
+vm2:
+    region:
+        name: %s
+    plan:
+        name: %s
+    os:
+        name: %s
+""" % (_region_name, _plan_name, _os_name, _region_name, _plan_name, _os_name)
+_cfg_ids_many_vms = """
+vm1:
+    dcid: %s
+    vpsplanid: %s
+    osid: %s
+vm2:
+    dcid: %s
+    vpsplanid: %s
+    osid: %s
+""" % (_dcid, _vpsplanid, _osid, _dcid, _vpsplanid, _osid)
 _cfg_script_id = """
 %s:
     dcid: %s
@@ -188,8 +217,22 @@ _cfg_script_id = """
 """ % (_label, _dcid, _vpsplanid, _osid, _script_id)
 
 
+def _callback_query_error(request, context):
+    raise AssertionError('No query expected: %s' % request.path)
+
+
 class TestProvision(unittest.TestCase):
 
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        state = os.path.join(self.dir.name, 'provisioned.json')
+        self.state = patch('vps.tool.provision._state_path', state)
+        self.state.start()
+
+    def tearDown(self):
+        self.state.stop()
+        self.dir.cleanup()
+
     def _task_context(self):
         ctx = Context()
         ctx.config.run.echo = False
@@ -288,3 +331,184 @@ class TestProvision(unittest.TestCase):
                                 'no query',
                                 'no response'
                                 )
+
+    def test_catalogs_queried_once(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = self._task_context()
+        responses = {
+            '/v1/regions/list': _region_response,
+            '/v1/plans/list': _plan_response,
+            '/v1/os/list': _os_response,
+        }
+        with requests_mock.mock() as m:
+            created = []
+
+            def _callback_query(request, context):
+                return responses[request.path]
+
+            def _callback_create(request, context):
+                qs = parse_qs(request.text)
+                self.assertEqual(_dcid, qs['DCID'][0])
+                self.assertEqual(_vpsplanid, qs['VPSPLANID'][0])
+                self.assertEqual(_osid, qs['OSID'][0])
+                created.append(qs['label'][0])
+
+            m.get(requests_mock.ANY, text=_callback_query)
+            m.post(requests_mock.ANY, text=_callback_create)
+
+            _MockedVP(ctx, _cfg_many_vms).run()
+            queried = [r.path for r in m.request_history if r.method == 'GET']
+            self.assertEqual(sorted(responses.keys()), sorted(queried))
+            self.assertEqual(['vm1', 'vm2'], created)
+
+    def test_failed_create_does_not_abort(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            created = []
+
+            def _callback_create(request, context):
+                label = parse_qs(request.text)['label'][0]
+                if label == 'vm1':
+                    context.status_code = 412
+                    return 'Plan not available'
+                created.append(label)
+                return '{"SUBID": "1312965"}'
+
+            m.get(requests_mock.ANY, text=_callback_query_error)
+            m.post(requests_mock.ANY, text=_callback_create)
+
+            vp = _MockedVP(ctx, _cfg_ids_many_vms)
+            vp.jobs = 2
+            with self.assertRaises(RuntimeError) as cm:
+                vp.run()
+            self.assertIn('vm1', str(cm.exception))
+            self.assertEqual(['vm2'], created)
+
+
+def _server(subid, label, dcid=_dcid, vpsplanid=_vpsplanid, osid=_osid,
+            tag=''):
+    return {'SUBID': subid, 'label': label, 'DCID': dcid,
+            'VPSPLANID': vpsplanid, 'OSID': osid, 'tag': tag}
+
+
+class TestReconcile(unittest.TestCase):
+
+    def _mocked_vp(self, cfg, servers, **kwargs):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = Context()
+        ctx.config.run.echo = False
+        self.m.get(requests_mock.ANY,
+                   text=json.dumps({s['SUBID']: s for s in servers}))
+        vp = _MockedVP(ctx, cfg)
+        vp.reconcile = True
+        for k, v in kwargs.items():
+            setattr(vp, k, v)
+        return vp
+
+    def _posts(self, path):
+        return [parse_qs(r.text) for r in self.m.request_history
+                if r.method == 'POST' and r.path == path]
+
+    def _created(self, *subids):
+        _record({subid: 'vm' for subid in subids}, ())
+
+    def setUp(self):
+        self.m = requests_mock.Mocker()
+        self.m.start()
+        self.m.post(requests_mock.ANY, text='{"SUBID": "1312965"}')
+        self.dir = tempfile.TemporaryDirectory()
+        state = os.path.join(self.dir.name, 'provisioned.json')
+        self.state = patch('vps.tool.provision._state_path', state)
+        self.state.start()
+
+    def tearDown(self):
+        self.state.stop()
+        self.dir.cleanup()
+        self.m.stop()
+
+    def test_converged(self):
+        labels = ['vm%d' % i for i in range(200)]
+        cfg = ''.join('%s:\n    dcid: %s\n    vpsplanid: %s\n    osid: %s\n' %
+                      (label, _dcid, _vpsplanid, _osid) for label in labels)
+        servers = [_server(str(i), label) for i, label in enumerate(labels)]
+        plan = self._mocked_vp(cfg, servers).run()
+        self.assertEqual(1, self.m.call_count)
+        self.assertEqual('/v1/server/list', self.m.request_history[0].path)
+        self.assertFalse(plan['create'])
+        self.assertEqual(200, len(plan['keep']))
+
+    def test_create_missing(self):
+        plan = self._mocked_vp(_cfg_ids_many_vms, [_server('1', 'vm1')]).run()
+        self.assertEqual({'vm1': '1'}, plan['keep'])
+        created = self._posts('/v1/server/create')
+        self.assertEqual([['vm2']], [qs['label'] for qs in created])
+
+    def test_plan_only(self):
+        vp = self._mocked_vp(_cfg_ids_many_vms, [], plan_only=True)
+        plan = vp.run()
+        self.assertEqual(['vm1', 'vm2'], [label for label, _ in plan['create']])
+        self.assertEqual(1, self.m.call_count)
+
+    def test_changed(self):
+        servers = [_server('1', 'vm1', vpsplanid='2'), _server('2', 'vm2')]
+        plan = self._mocked_vp(_cfg_ids_many_vms, servers).run()
+        self.assertEqual({'vm1': {'VPSPLANID': '2 -> 1'}}, plan['changed'])
+        self.assertFalse(self._posts('/v1/server/create'))
+
+    def test_prune(self):
+        servers = [_server('1', 'vm1'), _server('2', 'vm2'),
+                   _server('3', 'vm1'), _server('4', 'other')]
+        self._created('3', '4')
+        plan = self._mocked_vp(_cfg_ids_many_vms, servers, prune=True,
+                               confirmed=True).run()
+        self.assertEqual([('vm1', '3'), ('other', '4')], plan['destroy'])
+        destroyed = self._posts('/v1/server/destroy')
+        self.assertEqual(['3', '4'], sorted(qs['SUBID'][0] for qs in destroyed))
+
+    def test_prune_only_created(self):
+        servers = [_server('1', 'vm1'), _server('2', 'vm2'),
+                   _server('3', 'vm1'), _server('4', 'other'),
+                   _server('5', 'old', tag='web')]
+        self._created('3', '5')
+        plan = self._mocked_vp(_cfg_ids_many_vms, servers, prune=True,
+                               confirmed=True).run()
+        self.assertEqual([('vm1', '3'), ('old', '5')], plan['destroy'])
+        self.assertEqual({}, _created_servers())
+
+    def test_created_recorded(self):
+        self._mocked_vp(_cfg_ids_many_vms, [_server('1', 'vm1')]).run()
+        self.assertEqual({'1312965': 'vm2'}, _created_servers())
+
+    def test_prune_not_confirmed(self):
+        servers = [_server('1', 'vm1'), _server('4', 'other')]
+        self._created('4')
+        vp = self._mocked_vp(_cfg_ids_many_vms, servers, prune=True)
+        with self.assertRaises(RuntimeError) as cm:
+            vp.run()
+        self.assertIn('--yes', str(cm.exception))
+        self.assertFalse(self._posts('/v1/server/destroy'))
+        self.assertFalse(self._posts('/v1/server/create'))
+
+    def test_prune_plan_only(self):
+        servers = [_server('1', 'vm1'), _server('4', 'other')]
+        self._created('4')
+        vp = self._mocked_vp(_cfg_ids_many_vms, servers, prune=True,
+                             plan_only=True)
+        self.assertEqual([('other', '4')], vp.run()['destroy'])
+        self.assertEqual(1, self.m.call_count)
+
+    def test_prune_empty_config(self):
+        self._created('1')
+        vp = self._mocked_vp('', [_server('1', 'vm1')], prune=True,
+                             confirmed=True)
+        with self.assertRaises(ValueError):
+            vp.run()
+        self.assertFalse(self._posts('/v1/server/destroy'))
+
+    def test_no_prune(self):
+        servers = [_server('1', 'vm1'), _server('2', 'vm2'),
+                   _server('4', 'other')]
+        plan = self._mocked_vp(_cfg_ids_many_vms, servers).run()
+        self.assertFalse(plan['destroy'])
+        self.assertEqual(1, self.m.call_count)
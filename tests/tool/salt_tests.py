@@ -31,11 +31,15 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import os
+import os.path
 import requests_mock
+import tempfile
 import unittest
 import vps.vultr.key
 from invoke import Context
-from vps.tool.salt import salt_roster
+from ruamel.yaml import YAML
+from vps.tool.salt import salt_roster, _scalar
 
 
 _server_list = '''{
@@ -101,3 +105,77 @@ class TestSalt(unittest.TestCase):
             m.patch(requests_mock.ANY, text=_callback_error)
 
             self.assertEqual(_roster_response, salt_roster(ctx))
+
+
+_servers = '''{
+"1": {"SUBID": "1", "label": "web 1", "main_ip": "10.0.0.1",
+      "tag": "role=web,env=prod,blue"},
+"2": {"SUBID": "2", "label": "123", "main_ip": "10.0.0.2", "tag": ""}
+}'''
+
+
+class TestRoster(unittest.TestCase):
+
+    def setUp(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        self.dir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.dir.name, 'roster')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _roster(self, response=_servers, **kwargs):
+        ctx = Context()
+        ctx.config.run.echo = False
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=response)
+            return salt_roster(ctx, **kwargs)
+
+    def test_yaml(self):
+        roster = self._roster(output=self.output, port=2222, sudo=True,
+                              priv='~/.ssh/id_rsa', grains=True)
+        with open(self.output) as f:
+            self.assertEqual(roster, YAML(typ='safe').load(f))
+        self.assertEqual({'role': 'web', 'env': 'prod', 'tags': ['blue']},
+                         roster['web 1']['minion_opts']['grains'])
+        self.assertEqual(2222, roster['123']['port'])
+        self.assertNotIn('minion_opts', roster['123'])
+
+    def test_relative_output(self):
+        cwd = os.getcwd()
+        os.chdir(self.dir.name)
+        try:
+            roster = self._roster(output='roster')
+        finally:
+            os.chdir(cwd)
+        with open(self.output) as f:
+            self.assertEqual(roster, YAML(typ='safe').load(f))
+
+    def test_unchanged_file_not_rewritten(self):
+        self._roster(output=self.output)
+        os.utime(self.output, (0, 0))
+        self._roster(output=self.output)
+        self.assertEqual(0, os.stat(self.output).st_mtime)
+        self._roster(_servers.replace('10.0.0.2', '10.0.0.3'),
+                     output=self.output)
+        self.assertNotEqual(0, os.stat(self.output).st_mtime)
+        with open(self.output) as f:
+            self.assertIn('10.0.0.3', f.read())
+
+    def test_scalars(self):
+        yaml = YAML(typ='safe')
+        for value in ('1.2.3.4', '1.5', 'yes', 'Y', '12:30', '0x1f', 'a: b',
+                      'a:', ':a', '~', 'null', '2001:db8::1', 'vm_1', '- x',
+                      '#c', 'a #b', '? q', "it's", '"q"', '[1]', '{a}', '%p',
+                      '@a', '`b', '!t', '|', '>', '*ref', '&a', 'é', ' x ',
+                      '', '.inf', 'nan', '1e3', '2001-12-14', '010'):
+            text = '%s: %s' % (_scalar(value), _scalar(value))
+            self.assertEqual({value: value}, yaml.load(text))
+
+    def test_tricky_labels(self):
+        servers = _servers.replace('"web 1"', '"web: 1 #a"').replace(
+            'role=web', 'role=- web:')
+        roster = self._roster(servers, output=self.output, grains=True)
+        with open(self.output) as f:
+            self.assertEqual(roster, YAML(typ='safe').load(f))
+        self.assertIn('web: 1 #a', roster)
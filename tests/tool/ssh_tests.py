@@ -31,11 +31,15 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import asyncio
+import os.path
 import requests_mock
+import tempfile
 import unittest
 import vps.vultr.key
 from invoke import Context
-from vps.tool.ssh import ssh_list
+from unittest.mock import patch
+from vps.tool.ssh import _scan, ssh_keyscan, ssh_list
 
 
 _server_list = '''{
@@ -96,3 +100,106 @@ class TestSsh(unittest.TestCase):
             m.patch(requests_mock.ANY, text=_callback_error)
 
             self.assertEqual(_ssh_list_response, ssh_list(ctx))
+
+
+_two_servers = '''{
+"1": {"SUBID": "1", "label": "web1", "main_ip": "10.0.0.1"},
+"2": {"SUBID": "2", "label": "web2", "main_ip": "10.0.0.2"}
+}'''
+
+
+class TestKeyscan(unittest.TestCase):
+
+    def setUp(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        self.dir = tempfile.TemporaryDirectory()
+        self.known_hosts = os.path.join(self.dir.name, 'known_hosts')
+        state = os.path.join(self.dir.name, 'keyscan.json')
+        self.patches = [patch('vps.tool.ssh._state_path', state),
+                        patch('vps.tool.ssh._retry_delay', 0),
+                        patch('vps.tool.ssh._scan', side_effect=self._scan)]
+        for p in self.patches:
+            p.start()
+        self.scanned = []
+        self.down = set()
+        self.while_scanning = None
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.dir.cleanup()
+
+    async def _scan(self, ip, key_type, timeout):
+        self.scanned.append(ip)
+        if self.while_scanning:
+            self.while_scanning()
+            self.while_scanning = None
+        if ip in self.down:
+            return []
+        return ['ecdsa-sha2-nistp256 KEY%s' % ip]
+
+    def _keyscan(self, response=_two_servers, **kwargs):
+        ctx = Context()
+        ctx.config.run.echo = False
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=response)
+            return ssh_keyscan(ctx, known_hosts=self.known_hosts, **kwargs)
+
+    def _lines(self):
+        with open(self.known_hosts) as f:
+            return f.read().splitlines()
+
+    def test_scan(self):
+        with open(self.known_hosts, 'w') as f:
+            f.write('github.com ssh-rsa AAAA\n10.0.0.1,web1 ssh-rsa OLD\n')
+        scanned = self._keyscan()
+        self.assertEqual({'web1': '10.0.0.1', 'web2': '10.0.0.2'}, scanned)
+        self.assertEqual(['github.com ssh-rsa AAAA',
+                          '10.0.0.1,web1 ecdsa-sha2-nistp256 KEY10.0.0.1',
+                          '10.0.0.2,web2 ecdsa-sha2-nistp256 KEY10.0.0.2'],
+                         self._lines())
+
+    def test_only_changed_hosts(self):
+        self._keyscan()
+        self.scanned = []
+        changed = _two_servers.replace('10.0.0.2', '10.0.0.3')
+        self.assertEqual({'web2': '10.0.0.3'}, self._keyscan(changed))
+        self.assertEqual(['10.0.0.3'], self.scanned)
+        self.assertEqual(2, len(self._lines()))
+        self.assertFalse(self._keyscan(changed))
+
+    def test_force(self):
+        self._keyscan()
+        self.assertEqual(2, len(self._keyscan(force=True)))
+        self.assertEqual(2, len(self._lines()))
+
+    def test_retry_and_fail(self):
+        self.down.add('10.0.0.2')
+        with self.assertRaises(RuntimeError) as cm:
+            self._keyscan(retries=2)
+        self.assertIn('web2', str(cm.exception))
+        self.assertEqual(2, self.scanned.count('10.0.0.2'))
+        self.assertEqual(1, len(self._lines()))
+        # the failed host is scanned again on the next run
+        self.down.clear()
+        self.scanned = []
+        self._keyscan()
+        self.assertEqual(['10.0.0.2'], self.scanned)
+
+    def test_keep_hosts_added_while_scanning(self):
+
+        def _other_run():
+            with open(self.known_hosts, 'a') as f:
+                f.write('10.0.0.9,db1 ecdsa-sha2-nistp256 KEY10.0.0.9\n')
+
+        self.while_scanning = _other_run
+        self._keyscan()
+        self.assertIn('10.0.0.9,db1 ecdsa-sha2-nistp256 KEY10.0.0.9',
+                      self._lines())
+
+    def test_no_ssh_keyscan(self):
+        with patch('asyncio.create_subprocess_exec',
+                   side_effect=FileNotFoundError()):
+            with self.assertRaises(RuntimeError) as cm:
+                asyncio.run(_scan('10.0.0.1', 'ecdsa', 5))
+        self.assertIn('ssh-keyscan not found', str(cm.exception))
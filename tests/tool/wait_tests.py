@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import requests_mock
+import unittest
+import vps.vultr.key
+from invoke import Context
+from unittest.mock import patch
+from vps.tool.wait import wait_vultr
+
+
+_server = '''"%s": {
+    "SUBID": "%s",
+    "label": "%s",
+    "status": "%s",
+    "power_status": "%s",
+    "server_state": "%s"
+    }'''
+_pending = _server % ('1', '1', 'web1', 'pending', 'stopped', 'none')
+_active = _server % ('1', '1', 'web1', 'active', 'running', 'ok')
+_other_pending = _server % ('2', '2', 'db1', 'active', 'running', 'installingbooting')
+_other_active = _server % ('2', '2', 'db1', 'active', 'running', 'ok')
+
+
+def _response(*servers):
+    return '{%s}' % ','.join(servers)
+
+
+class TestWait(unittest.TestCase):
+
+    def _task_context(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        return ctx
+
+    def test_no_key(self):
+        vps.vultr.key._api_key = ''
+        self.assertIsNone(wait_vultr(self._task_context()))
+
+    @patch('vps.tool.wait.time')
+    def test_wait_all(self, mock_time):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        mock_time.monotonic.side_effect = [0, 1, 6, 16]
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, [
+                {'text': _response(_pending, _other_pending)},
+                {'text': _response(_active, _other_pending)},
+                {'text': _response(_active, _other_active)},
+            ])
+            ready = wait_vultr(self._task_context())
+            self.assertEqual(3, m.call_count)
+        self.assertEqual({'web1': 6, 'db1': 16}, ready)
+        # back off while nothing changes, poll quickly again after progress
+        delays = [c[0][0] for c in mock_time.sleep.call_args_list]
+        self.assertEqual([5, 5], delays)
+
+    @patch('vps.tool.wait.time')
+    def test_wait_subid(self, mock_time):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        mock_time.monotonic.side_effect = [0, 1, 2]
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, [
+                {'text': _response(_other_pending)},
+                {'text': _response(_active, _other_pending)},
+            ])
+            ready = wait_vultr(self._task_context(), subid='1')
+        self.assertEqual(['web1'], list(ready.keys()))
+
+    @patch('vps.tool.wait.time')
+    def test_backoff_and_timeout(self, mock_time):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        mock_time.monotonic.side_effect = [0, 1, 6, 16, 36, 66]
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_response(_pending))
+            with self.assertRaises(RuntimeError) as cm:
+                wait_vultr(self._task_context(), timeout=60)
+            self.assertIn('1', str(cm.exception))
+        delays = [c[0][0] for c in mock_time.sleep.call_args_list]
+        self.assertEqual([5, 10, 20, 24], delays)
@@ -35,7 +35,9 @@ import requests_mock
 import unittest
 import vps.vultr.key
 from invoke import Context
+from unittest.mock import patch
 from urllib.parse import parse_qs
+from vps.tool.inventory import inventory_refresh
 from vps.tool.wipe import wipe_vultr
 
 
@@ -115,3 +117,54 @@ class TestWipe(unittest.TestCase):
             m.post(requests_mock.ANY, text=_callback_destroy)
 
             self.assertEqual('576965', wipe_vultr(ctx)['my new server'])
+
+    @patch('vps.vultr.client.time')
+    def test_retry_rate_limit(self, mock_time):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            m.post(requests_mock.ANY, [{'status_code': 503, 'text': ''},
+                                       {'status_code': 200, 'text': ''}])
+            self.assertEqual('576965', wipe_vultr(ctx)['my new server'])
+            self.assertEqual(1, mock_time.sleep.call_count)
+
+    @patch('vps.vultr.client._retries', 1)
+    @patch('vps.vultr.client.time')
+    def test_failed_destroy(self, mock_time):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            m.post(requests_mock.ANY, status_code=503, text='')
+            with self.assertRaises(RuntimeError) as cm:
+                wipe_vultr(ctx)
+            self.assertIn('576965', str(cm.exception))
+            self.assertEqual(2, len([r for r in m.request_history
+                                     if r.method == 'POST']))
+
+    def test_wipe_by_tag(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+
+            def _callback_query(request, context):
+                self.assertEqual(['mytag'], request.qs['tag'])
+                return _server_list_response
+
+            m.get(requests_mock.ANY, text=_callback_query)
+            m.post(requests_mock.ANY, text='')
+            self.assertEqual('576965', wipe_vultr(ctx, tag='mytag')['my new server'])
+
+    def test_wipe_from_snapshot(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_server_list_response)
+            m.post(requests_mock.ANY, text='')
+            inventory_refresh(ctx)
+            self.assertFalse(wipe_vultr(ctx, tag='other', max_age=60))
+            wiped = wipe_vultr(ctx, tag='mytag', max_age=60)
+            self.assertEqual('576965', wiped['my new server'])
+            self.assertEqual(1, len([r for r in m.request_history
+                                     if r.method == 'GET']))
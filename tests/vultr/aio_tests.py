@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import requests_mock
+import threading
+import time
+import unittest
+import vps.vultr.key
+from invoke import Context
+from vps.vultr import aio
+
+
+class TestAio(unittest.TestCase):
+
+    def _task_context(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        return ctx
+
+    def test_bounded_gather(self):
+        running = []
+        peak = []
+
+        async def _job(i):
+            running.append(i)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(i)
+            return i
+
+        result = aio.run(aio.gather([_job(i) for i in range(10)], limit=3))
+        self.assertEqual(list(range(10)), result)
+        self.assertEqual(3, max(peak))
+
+    def test_gather_exceptions(self):
+        async def _fail():
+            raise ValueError('boom')
+
+        async def _ok():
+            return 1
+
+        result = aio.run(aio.gather([_ok(), _fail()], limit=2,
+                                    return_exceptions=True))
+        self.assertEqual(1, result[0])
+        self.assertIsInstance(result[1], ValueError)
+
+    def test_workers(self):
+        threads = set()
+
+        def _blocking():
+            threads.add(threading.get_ident())
+            time.sleep(0.05)
+
+        aws = [aio.to_thread(_blocking) for _ in range(15)]
+        aio.run(aio.gather(aws, limit=15), workers=15)
+        self.assertEqual(15, len(threads))
+
+    def test_query(self):
+        ctx = self._task_context()
+        result = {2: {'field1': 2}, 3: {'field1': 3}}
+        filtered = aio.run(aio.query(ctx, lambda v: result, {'field1': 3}))
+        self.assertEqual([{'field1': 3}], filtered)
+
+    def test_fan_out_destroy(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.post(requests_mock.ANY, text='')
+            subids = [str(i) for i in range(5)]
+            aio.run(aio.gather([aio.server_destroy(ctx, subid)
+                                for subid in subids], limit=5))
+            destroyed = sorted(r.text.split('=')[1] for r in m.request_history)
+            self.assertEqual(subids, destroyed)
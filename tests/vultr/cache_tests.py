@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import os
+import os.path
+import requests_mock
+import tempfile
+import unittest
+from invoke import Config, Context
+from vps.vultr.cache import cached
+from vps.vultr.regions import regions_list
+
+
+_region_response = '''{
+"1": {
+    "DCID": "1",
+    "name": "New Jersey",
+    "country": "US",
+    "continent": "North America",
+    "state": "NJ"
+    }
+}'''
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _task_context(self, enabled=True, ttl=None):
+        cache = {'enabled': enabled, 'path': self.tmp.name}
+        if ttl is not None:
+            cache['ttl'] = ttl
+        ctx = Context(Config(overrides={'cache': cache}))
+        ctx.config.run.echo = False
+        return ctx
+
+    def _fetch(self, data):
+        calls = []
+
+        def _f():
+            calls.append(1)
+            return data
+        return _f, calls
+
+    def test_cached_response(self):
+        ctx = self._task_context()
+        fetch, calls = self._fetch({'1': {'DCID': '1'}})
+        self.assertEqual({'1': {'DCID': '1'}}, cached(ctx, 'regions.list', fetch))
+        self.assertEqual({'1': {'DCID': '1'}}, cached(ctx, 'regions.list', fetch))
+        self.assertEqual(1, len(calls))
+
+    def test_refresh(self):
+        ctx = self._task_context()
+        fetch, calls = self._fetch({'1': {'DCID': '1'}})
+        cached(ctx, 'regions.list', fetch)
+        cached(ctx, 'regions.list', fetch, refresh=True)
+        self.assertEqual(2, len(calls))
+
+    def test_disabled(self):
+        ctx = self._task_context(enabled=False)
+        fetch, calls = self._fetch({'1': {'DCID': '1'}})
+        cached(ctx, 'regions.list', fetch)
+        cached(ctx, 'regions.list', fetch)
+        self.assertEqual(2, len(calls))
+        self.assertFalse(os.listdir(self.tmp.name))
+
+    def test_no_cache_config(self):
+        ctx = Context()
+        fetch, calls = self._fetch({'1': {'DCID': '1'}})
+        cached(ctx, 'regions.list', fetch)
+        cached(ctx, 'regions.list', fetch)
+        self.assertEqual(2, len(calls))
+
+    def test_expired(self):
+        ctx = self._task_context(ttl={'regions.list': 60})
+        fetch, calls = self._fetch({'1': {'DCID': '1'}})
+        cached(ctx, 'regions.list', fetch)
+        path = os.path.join(self.tmp.name, 'regions.list.json')
+        with open(path, 'r') as f:
+            entry = json.load(f)
+        entry['created'] -= 120
+        with open(path, 'w') as f:
+            json.dump(entry, f)
+        cached(ctx, 'regions.list', fetch)
+        self.assertEqual(2, len(calls))
+
+    def test_keyed_by_params(self):
+        ctx = self._task_context()
+        fetch, calls = self._fetch({'1': {'VPSPLANID': '1'}})
+        cached(ctx, 'plans.list', fetch, {'type': 'vc2'})
+        cached(ctx, 'plans.list', fetch, {'type': 'ssd'})
+        cached(ctx, 'plans.list', fetch, {'type': 'vc2'})
+        self.assertEqual(2, len(calls))
+
+    def test_empty_response_not_cached(self):
+        ctx = self._task_context()
+        fetch, calls = self._fetch({})
+        cached(ctx, 'regions.list', fetch)
+        cached(ctx, 'regions.list', fetch)
+        self.assertEqual(2, len(calls))
+
+    def test_regions_list(self):
+        ctx = self._task_context()
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=_region_response)
+            first = regions_list(ctx)
+            second = regions_list(ctx, criteria="{'DCID': '1'}")
+            self.assertEqual(1, m.call_count)
+            self.assertEqual(first, second)
+            regions_list(ctx, refresh=True)
+            self.assertEqual(2, m.call_count)
@@ -38,7 +38,7 @@ import ruamel.yaml
 import unittest
 import vps.vultr.key
 from invoke import Context
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, urlsplit
 from vps.console import puts
 from vps.vultr.tasks import collection
 from .scenario_file import load_cached_scenarios
@@ -188,7 +188,26 @@ class _TestCachedScenarios(object):
 
     def _callback(self, request, context):
         self._check_request(request, context)
-        return self.scenario.response
+        return self._filtered_response(request)
+
+    def _filtered_response(self, request):
+        # like the API, list endpoints only return the objects matching the
+        # documented params sent, i.e. SNAPSHOTID for snapshot.list
+        response = self.scenario.response
+        if request.method != 'GET' or not response.strip():
+            return response
+        objects = json.loads(response)
+        if not isinstance(objects, dict) or \
+                not all(isinstance(o, dict) for o in objects.values()):
+            return response
+        doc_params = self.scenario.parse_doc_params().keys()
+        query = parse_qs(urlsplit(request.url).query)
+        filters = {k: v[0] for k, v in query.items() if k in doc_params}
+        filtered = {k: o for k, o in objects.items()
+                    if all(str(o.get(f, v)) == v for f, v in filters.items())}
+        if len(filtered) == len(objects):
+            return response
+        return json.dumps(filtered)
 
     def _task_context(self):
         ctx = Context()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import requests_mock
+import unittest
+import vps.vultr.client
+import vps.vultr.key
+from unittest.mock import patch
+from vps.vultr.client import get_client, get_session
+from vultr.utils import VultrError
+
+
+class TestClient(unittest.TestCase):
+
+    def test_client_per_key(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        client = get_client()
+        self.assertIs(client, get_client())
+        vps.vultr.key._api_key = 'OTHER'
+        self.assertIsNot(client, get_client())
+
+    def test_shared_session(self):
+        session = get_session()
+        self.assertIs(session, get_session())
+        adapter = session.get_adapter('https://api.vultr.com')
+        self.assertEqual(vps.vultr.client._pool_size, adapter._pool_maxsize)
+
+    def test_requests_through_session(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        session = get_session()
+        with requests_mock.mock() as m, \
+                patch.object(session, 'request', wraps=session.request) as r:
+            m.get(requests_mock.ANY, text='{}')
+            m.post(requests_mock.ANY, text='')
+            client = get_client()
+            client.server.list()
+            client.server.ipv4.list('576965')
+            client.server.destroy('576965')
+            for request in m.request_history:
+                self.assertEqual(['example'], request.qs['api_key'])
+                self.assertEqual(vps.vultr.client._timeout, request.timeout)
+            self.assertEqual(3, m.call_count)
+            self.assertEqual(3, r.call_count)
+
+    def test_endpoint(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        with requests_mock.mock() as m, \
+                patch('vps.vultr.client._endpoint', 'http://127.0.0.1:8080/'), \
+                patch('vps.vultr.client._clients', {}):
+            m.get(requests_mock.ANY, text='{}')
+            get_client().server.ipv4.list('576965')
+            self.assertEqual('http://127.0.0.1:8080/v1/server/list_ipv4',
+                             m.request_history[0].url.split('?')[0])
+
+
+@patch('vps.vultr.client.time')
+class TestRetries(unittest.TestCase):
+
+    def setUp(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+
+    def test_get_retried(self, mock_time):
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, [{'status_code': 500, 'text': ''},
+                                      {'status_code': 503, 'text': ''},
+                                      {'status_code': 200, 'text': '{}'}])
+            self.assertEqual({}, get_client().server.list())
+            self.assertEqual(3, m.call_count)
+            self.assertEqual(2, mock_time.sleep.call_count)
+
+    def test_retry_after(self, mock_time):
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, [{'status_code': 503, 'text': '',
+                                       'headers': {'Retry-After': '7'}},
+                                      {'status_code': 200, 'text': '{}'}])
+            get_client().server.list()
+            mock_time.sleep.assert_called_once_with(7.0)
+
+    def test_backoff(self, mock_time):
+        with requests_mock.mock() as m, \
+                patch('vps.vultr.client._retries', 3):
+            m.get(requests_mock.ANY, status_code=503, text='')
+            with self.assertRaises(VultrError):
+                get_client().server.list()
+            self.assertEqual(4, m.call_count)
+            delays = [c[0][0] for c in mock_time.sleep.call_args_list]
+            for attempt, delay in enumerate(delays):
+                limit = vps.vultr.client._backoff * 2 ** attempt
+                self.assertTrue(0 <= delay <= limit)
+
+    def test_destroy_not_retried_after_error(self, mock_time):
+        with requests_mock.mock() as m:
+            m.post(requests_mock.ANY, status_code=500, text='')
+            with self.assertRaises(VultrError):
+                get_client().server.destroy('576965')
+            self.assertEqual(1, m.call_count)
+
+    def test_create_single_request(self, mock_time):
+        with requests_mock.mock() as m:
+            m.post(requests_mock.ANY, text='{"SUBID": "576965"}')
+            result = get_client().server.create(1, 1, 127,
+                                                params={'label': 'web1'})
+            self.assertEqual({'SUBID': '576965'}, result)
+            self.assertEqual(1, m.call_count)
+
+    def test_create_label_exists(self, mock_time):
+        with requests_mock.mock() as m:
+            m.post(requests_mock.ANY, status_code=500, text='')
+            m.get(requests_mock.ANY,
+                  text='{"576965": {"SUBID": "576965", "label": "web1"}}')
+            with self.assertRaises(RuntimeError) as cm:
+                get_client().server.create(1, 1, 127,
+                                           params={'label': 'web1'})
+            self.assertIn('576965', str(cm.exception))
+            posts = [r for r in m.request_history if r.method == 'POST']
+            self.assertEqual(1, len(posts))
+            self.assertEqual(['web1'], m.request_history[1].qs['label'])
+
+    def test_create_retried_when_not_found(self, mock_time):
+        with requests_mock.mock() as m:
+            m.post(requests_mock.ANY, [{'status_code': 500, 'text': ''},
+                                       {'text': '{"SUBID": "576965"}'}])
+            m.get(requests_mock.ANY, text='[]')
+            result = get_client().server.create(1, 1, 127,
+                                                params={'label': 'web1'})
+            self.assertEqual({'SUBID': '576965'}, result)
+            posts = [r for r in m.request_history if r.method == 'POST']
+            self.assertEqual(2, len(posts))
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+from vps.vultr.criteria import compile_criteria, index
+
+
+_servers = [
+    {'SUBID': '1', 'label': 'web1', 'ram': '1024 MB', 'vcpu_count': '1',
+     'DCID': '1', 'date_created': '2017-01-02 10:00:00'},
+    {'SUBID': '2', 'label': 'web2', 'ram': '2048 MB', 'vcpu_count': '2',
+     'DCID': '9', 'date_created': '2017-03-02 10:00:00'},
+    {'SUBID': '3', 'label': 'db1', 'ram': '4096 MB', 'vcpu_count': '4',
+     'DCID': '9', 'date_created': '2017-05-02 10:00:00', 'tag': 'db'},
+]
+
+
+class TestCriteria(unittest.TestCase):
+
+    def _subids(self, criteria, indexes=None):
+        rows = compile_criteria(criteria).select(_servers, indexes)
+        return [row['SUBID'] for row in rows]
+
+    def test_equality(self):
+        self.assertEqual(['2'], self._subids({'label': 'web2'}))
+        self.assertEqual(['2', '3'], self._subids("{'DCID': '9'}"))
+
+    def test_missing_field(self):
+        self.assertEqual(['1', '2'], self._subids({'tag': None}))
+
+    def test_operators(self):
+        self.assertEqual(['1', '2'], self._subids({'label': {'prefix': 'web'}}))
+        self.assertEqual(['3'], self._subids({'label': {'re': '^db[0-9]$'}}))
+        self.assertEqual(['1'], self._subids({'DCID': {'!=': '9'}}))
+        self.assertEqual(['1', '3'], self._subids({'SUBID': {'in': ['1', '3']}}))
+        self.assertEqual(['2', '3'], self._subids({'vcpu_count': {'>': 1}}))
+        self.assertEqual(['1', '2'], self._subids({'vcpu_count': {'<=': '2'}}))
+        self.assertEqual(['1'], self._subids({'date_created': {'<': '2017-02'}}))
+        self.assertEqual(['2'], self._subids({'vcpu_count': {'>=': 2, '<': 4}}))
+
+    def test_combined(self):
+        criteria = {'DCID': '9', 'label': {'prefix': 'web'}}
+        self.assertEqual(['2'], self._subids(criteria))
+
+    def test_unknown_operator(self):
+        with self.assertRaises(ValueError):
+            compile_criteria({'label': {'like': 'web'}})
+
+    def test_compiled_once(self):
+        self.assertIs(compile_criteria("{'label': 'web1'}"),
+                      compile_criteria("{'label': 'web1'}"))
+
+    def test_index(self):
+        indexes = {'DCID': index(_servers, 'DCID')}
+        self.assertEqual(['2', '3'], self._subids({'DCID': '9'}, indexes))
+        self.assertEqual(['3'], self._subids({'DCID': '9', 'label': 'db1'}, indexes))
+        self.assertEqual([], self._subids({'DCID': '5'}, indexes))
+
+    def test_unhashable_index(self):
+        self.assertIsNone(index([{'locations': [1, 2]}], 'locations'))
+
+    def test_pushdown(self):
+        criteria = compile_criteria({'label': 'web1', 'ram': {'>=': 1024},
+                                     'tag': {'==': 'db', '!=': None}})
+        pushed = criteria.pushdown(('label', 'tag', 'DCID'))
+        self.assertEqual({'label': 'web1', 'tag': 'db'}, pushed)
+
+    def test_nothing_to_push(self):
+        criteria = compile_criteria({'label': {'prefix': 'web'},
+                                     'DCID': ['1', '9']})
+        self.assertEqual({}, criteria.pushdown(('label', 'DCID')))
+
+    def test_empty_not_pushed(self):
+        criteria = compile_criteria({'tag': '', 'label': {'==': ''},
+                                     'DCID': 0, 'SUBID': False})
+        self.assertEqual({}, criteria.pushdown(('tag', 'label', 'DCID',
+                                                'SUBID')))
@@ -31,6 +31,8 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import contextlib
+import io
 import unittest
 from invoke import Context
 from vps.vultr.query import query
@@ -46,3 +48,62 @@ class TestQuery(unittest.TestCase):
         self.assertEqual(1, len(filtered_result))
         self.assertFalse(filtered_result[0].get('field2'))
 
+
+    def test_pushdown(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        sent = []
+
+        def q(client, params):
+            sent.append(params)
+            return {'1': {'label': 'db', 'ram': '1024 MB'},
+                    '2': {'label': 'db', 'ram': '2048 MB'}}
+        result = query(ctx, q, {'label': 'db', 'ram': {'prefix': '1024'}},
+                       pushdown=('label',))
+        self.assertEqual([{'label': 'db'}], sent)
+        self.assertEqual([{'label': 'db', 'ram': '1024 MB'}], result)
+
+    def test_pushed_checked_locally(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        sent = []
+
+        def q(client, params):
+            sent.append(params)
+            # the API ignores empty filters
+            return {'1': {'tag': ''}, '2': {'tag': 'db'}}
+        result = query(ctx, q, {'tag': ''}, pushdown=('tag',))
+        self.assertEqual([{}], sent)
+        self.assertEqual([{'tag': ''}], result)
+
+    def test_explicit_params_not_pushed(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        sent = []
+
+        def q(client, params):
+            sent.append(params)
+            return {'1': {'label': 'web', 'tag': 'a'}}
+        result = query(ctx, q, {'tag': 'b'}, params={'tag': 'a'},
+                       pushdown=('tag',))
+        self.assertEqual([{'tag': 'a'}], sent)
+        self.assertEqual([], result)
+
+    def test_single_object(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        result = query(ctx, lambda v, p: {'SUBID': '1', 'label': 'web'}, '',
+                       pushdown=())
+        self.assertEqual([{'SUBID': '1', 'label': 'web'}], result)
+
+    def test_empty_machine_readable(self):
+        ctx = Context()
+        ctx.config.run.echo = True
+        expected = {'json': '[]\n', 'jsonl': '', 'csv': 'a,b\n',
+                    'tsv': 'a\tb\n', 'table': ''}
+        for fmt, text in expected.items():
+            ctx.config.output = {'format': fmt}
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                query(ctx, lambda v: {'1': {'b': 2, 'a': 1}}, {'a': 2})
+            self.assertEqual(text, out.getvalue(), fmt)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os.path
+import requests_mock
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import vps.vultr.key
+from unittest.mock import patch
+from vps.vultr.client import get_client
+from vps.vultr.ratelimit import SharedTokenBucket, load_bucket
+
+_acquire = '''
+import sys
+from vps.vultr.ratelimit import SharedTokenBucket
+bucket = SharedTokenBucket(sys.argv[1], 20)
+for _ in range(3):
+    bucket.acquire()
+'''
+
+
+class TestSharedTokenBucket(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'ratelimit')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_shared_by_instances(self):
+        buckets = [SharedTokenBucket(self.path + '.state', 20, burst=2)
+                   for _ in range(2)]
+        start = time.monotonic()
+        for bucket in buckets * 2:
+            bucket.acquire()
+        # 2 tokens available right away, the other 2 take 1/20s each
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_shared_by_processes(self):
+        cmd = [sys.executable, '-c', _acquire, self.path + '.state']
+        start = time.monotonic()
+        processes = [subprocess.Popen(cmd) for _ in range(2)]
+        for p in processes:
+            self.assertEqual(0, p.wait())
+        # 6 requests with a burst of 1: 5 waits of 1/20s
+        self.assertGreaterEqual(time.monotonic() - start, 0.24)
+
+    def test_not_configured(self):
+        self.assertIsNone(load_bucket(self.path, 'EXAMPLE'))
+
+    def test_bucket_per_key(self):
+        with open(self.path, 'w') as f:
+            f.write('rate: 2\nburst: 3\n')
+        bucket = load_bucket(self.path, 'EXAMPLE')
+        self.assertEqual(2, bucket.rate)
+        self.assertEqual(3, bucket.burst)
+        self.assertNotEqual(bucket.path, load_bucket(self.path, 'OTHER').path)
+
+    def test_client(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        with open(self.path, 'w') as f:
+            f.write('rate: 100\n')
+        with requests_mock.mock() as m, \
+                patch('vps.vultr.client._ratelimit_cfg', self.path), \
+                patch('vps.vultr.client._limiters', {}), \
+                patch.object(SharedTokenBucket, 'acquire') as acquire:
+            m.get(requests_mock.ANY, text='{}')
+            get_client().server.list()
+            self.assertEqual(1, acquire.call_count)
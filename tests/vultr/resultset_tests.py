@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import json
+import requests_mock
+import unittest
+import vps.vultr.key
+from unittest.mock import patch
+from invoke import Context
+from vps.tool.salt import salt_roster
+from vps.tool.ssh import ssh_list
+from vps.vultr.criteria import compile_criteria
+from vps.vultr.query import query
+from vps.vultr.resultset import ResultSet
+
+
+_servers = [
+    {'SUBID': '1', 'label': 'web1', 'ram': '1024 MB', 'vcpu_count': '1',
+     'DCID': '1'},
+    {'SUBID': '2', 'label': 'web2', 'ram': '2048 MB', 'vcpu_count': '2',
+     'DCID': '9'},
+    {'SUBID': '3', 'label': 'db1', 'ram': '4096 MB', 'vcpu_count': '4',
+     'DCID': '9', 'tag': 'db'},
+]
+
+
+class TestResultSet(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = ResultSet(_servers)
+
+    def _subids(self, rs):
+        return [row['SUBID'] for row in rs]
+
+    def test_rows(self):
+        self.assertEqual(3, len(self.rs))
+        self.assertEqual(_servers, self.rs)
+        self.assertEqual(_servers[2], dict(self.rs[2]))
+        self.assertEqual('web2', self.rs[1].get('label'))
+
+    def test_missing_field(self):
+        row = self.rs[0]
+        self.assertNotIn('tag', row)
+        self.assertIsNone(row.get('tag'))
+        self.assertRaises(KeyError, lambda: row['tag'])
+        self.assertEqual([None, None, 'db'], self.rs.column('tag'))
+
+    def test_select(self):
+        def select(criteria):
+            return self._subids(self.rs.select(compile_criteria(criteria)))
+        self.assertEqual(['2', '3'], select({'DCID': '9'}))
+        self.assertEqual(['2', '3'], select({'vcpu_count': {'>=': 2}}))
+        self.assertEqual(['1', '2'], select({'tag': None}))
+        self.assertEqual(['3'], select({'DCID': '9', 'label': {'prefix': 'db'}}))
+        self.assertEqual([], select({'unknown': {'>': 0}}))
+
+    def test_same_as_criteria(self):
+        criteria = compile_criteria({'vcpu_count': {'<': 4}, 'tag': {'!=': 'db'}})
+        self.assertEqual(criteria.select(_servers), self.rs.select(criteria))
+
+    def test_sort(self):
+        self.assertEqual(['3', '2', '1'],
+                         self._subids(self.rs.sort('vcpu_count', reverse=True,
+                                                   numeric=True)))
+        self.assertEqual(['3', '1', '2'], self._subids(self.rs.sort('label')))
+        # rows without the field go last
+        self.assertEqual(['3', '1', '2'], self._subids(self.rs.sort('tag')))
+
+    def test_numbers_parsed_once(self):
+        numbers = self.rs.numbers('vcpu_count')
+        self.assertEqual([1.0, 2.0, 4.0], list(numbers))
+        self.assertIs(numbers, self.rs[1:].numbers('vcpu_count'))
+
+    def test_serialize(self):
+        self.assertEqual(_servers, json.loads(json.dumps(self.rs.to_list())))
+
+
+class TestColumnarQuery(unittest.TestCase):
+
+    def test_query(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        result = {s['SUBID']: s for s in _servers}
+        with patch('vps.vultr.query._columnar_rows', 2):
+            rows = query(ctx, lambda v: result, {'vcpu_count': {'>': 1}})
+        self.assertIsInstance(rows, ResultSet)
+        self.assertEqual(_servers[1:], rows)
+
+    def test_small_result(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        with patch('vps.vultr.query._columnar_rows', 2):
+            rows = query(ctx, lambda v: {'1': _servers[0]}, '')
+        self.assertEqual([_servers[0]], rows)
+        self.assertNotIsInstance(rows, ResultSet)
+
+    def test_tools(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        servers = {s['SUBID']: dict(s, main_ip='10.0.0.%s' % s['SUBID'])
+                   for s in _servers}
+        with patch('vps.vultr.query._columnar_rows', 1), \
+                patch.object(vps.vultr.key, '_api_key', 'EXAMPLE'), \
+                requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=json.dumps(servers))
+            self.assertEqual('10.0.0.3 vultr.com,10.0.0.3,db1',
+                             ssh_list(ctx)[2])
+            self.assertEqual('10.0.0.1', salt_roster(ctx)['web1']['host'])
@@ -31,14 +31,19 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import json
+import os
+import os.path
 import requests_mock
 import tempfile
 import unittest
 import vps.vultr.key
 from ast import literal_eval
 from invoke import Context
+from unittest.mock import patch
 from urllib.parse import parse_qs
 from vps.vultr.startupscript import startupscript_create, startupscript_update
+from vps.vultr.startupscript import startupscript_sync
 
 
 _script_name = 'test script'
@@ -106,3 +111,92 @@ class TestStartupscript(unittest.TestCase):
                                               script=script_path
                                               )
             self.assertEqual(literal_eval(_response), result)
+
+
+class TestSync(unittest.TestCase):
+    """
+    Simulates the remote scripts, to check what sync sends
+    """
+
+    def setUp(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        self.dir = tempfile.TemporaryDirectory()
+        self.scripts = os.path.join(self.dir.name, 'scripts')
+        os.mkdir(self.scripts)
+        manifest = os.path.join(self.dir.name, 'startupscripts.json')
+        self.manifest = patch('vps.vultr.startupscript._manifest_path',
+                              manifest)
+        self.manifest.start()
+        self.remote = {}
+        self.posts = []
+
+    def tearDown(self):
+        self.manifest.stop()
+        self.dir.cleanup()
+
+    def _write(self, name, script):
+        with open(os.path.join(self.scripts, name), 'w') as f:
+            f.write(script)
+
+    def _list(self, request, context):
+        return json.dumps(self.remote)
+
+    def _post(self, request, context):
+        qs = {k: v[0] for k, v in parse_qs(request.text).items()}
+        self.posts.append((request.path, qs))
+        if request.path.endswith('/create'):
+            scriptid = str(len(self.remote) + 1)
+            self.remote[scriptid] = {'SCRIPTID': scriptid, 'name': qs['name'],
+                                     'type': qs['type'], 'script': qs['script'],
+                                     'date_modified': '2017-01-01 00:00:00'}
+            return '{"SCRIPTID": %s}' % scriptid
+        remote = self.remote[qs['SCRIPTID']]
+        remote.update(name=qs['name'], script=qs['script'],
+                      date_modified='2017-01-02 00:00:00')
+        return ''
+
+    def _sync(self):
+        ctx = Context()
+        ctx.config.run.echo = False
+        self.posts = []
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=self._list)
+            m.post(requests_mock.ANY, text=self._post)
+            return startupscript_sync(ctx, self.scripts)
+
+    def test_sync(self):
+        self._write('web', _startupscript)
+        self._write('pxe', '#!ipxe\necho hello')
+        self._write('.hidden', 'ignored')
+        result = self._sync()
+        self.assertEqual(['pxe', 'web'], result['Created scripts'])
+        types = {qs['name']: qs['type'] for _, qs in self.posts}
+        self.assertEqual({'web': 'boot', 'pxe': 'pxe'}, types)
+        # nothing changed
+        result = self._sync()
+        self.assertEqual(['pxe', 'web'], result['Unchanged scripts'])
+        self.assertFalse(self.posts)
+
+    def test_update_changed_only(self):
+        self._write('web', _startupscript)
+        self._write('db', _startupscript)
+        self._sync()
+        self._write('web', _startupscript + '\necho updated')
+        result = self._sync()
+        self.assertEqual(['web'], result['Updated scripts'])
+        self.assertEqual([('/v1/startupscript/update', 'web')],
+                         [(path, qs['name']) for path, qs in self.posts])
+        self.assertFalse(self._sync()['Updated scripts'])
+
+    def test_existing_remote_script(self):
+        self.remote['7'] = {'SCRIPTID': '7', 'name': 'web', 'type': 'boot',
+                            'script': _startupscript,
+                            'date_modified': '2016-01-01 00:00:00'}
+        self._write('web', _startupscript)
+        self.assertEqual(['web'], self._sync()['Unchanged scripts'])
+        self.assertFalse(self.posts)
+        # modified in the control panel
+        self.remote['7']['script'] = 'echo changed'
+        self.remote['7']['date_modified'] = '2016-02-01 00:00:00'
+        self.assertEqual(['web'], self._sync()['Updated scripts'])
+        self.assertEqual(_startupscript, self.remote['7']['script'])
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import contextlib
+import io
+import json
+import requests_mock
+import unittest
+import vps.vultr.key
+from unittest.mock import patch
+from invoke import Context
+from vps.vultr.stream import decode, iter_items
+from vps.vultr.snapshot import snapshot_list
+
+
+_servers = {str(i): {'SUBID': str(i), 'label': 'vm%d' % i, 'ram': 1024 * i,
+                     'tag': 'café', 'extra': [None, True, 1.5]}
+            for i in range(50)}
+
+
+def _chunks(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterItems(unittest.TestCase):
+
+    def test_chunks(self):
+        text = json.dumps(_servers)
+        for size in (1, 7, 100, len(text)):
+            items = iter_items(decode(_chunks(text, size)))
+            self.assertEqual(list(_servers.items()), list(items))
+
+    def test_empty(self):
+        self.assertEqual([], list(iter_items(['{ }'])))
+        self.assertEqual([], list(iter_items(['[', ']'])))
+        self.assertEqual([], list(iter_items([])))
+
+    def test_array(self):
+        self.assertEqual([(0, 'a'), (1, 2)], list(iter_items(['["a", ', '2]'])))
+
+    def test_number_split(self):
+        self.assertEqual([('a', 123)], list(iter_items(['{"a": 12', '3}'])))
+
+    def test_truncated(self):
+        self.assertRaises(ValueError, list, iter_items(['{"a": 1', ', "b"']))
+        self.assertRaises(ValueError, list, iter_items(['{"a": {"b": 1}']))
+
+    def test_items_before_the_end(self):
+        def chunks():
+            yield '{"1": {"SUBID": "1"}, '
+            raise AssertionError('read too soon')
+        self.assertEqual(('1', {'SUBID': '1'}), next(iter_items(chunks())))
+
+
+class _Body(io.RawIOBase):
+    """
+    Response body counting the bytes read so far
+    """
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.read_bytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.data.readinto(b)
+        self.read_bytes += n
+        return n
+
+
+class TestStreamedQuery(unittest.TestCase):
+
+    def setUp(self):
+        vps.vultr.key._api_key = 'EXAMPLE'
+        self.ctx = Context()
+        self.ctx.config.run.echo = True
+
+    def test_displayed_while_received(self):
+        body = _Body(json.dumps({str(i): {'SNAPSHOTID': str(i)}
+                                 for i in range(5000)}).encode())
+        received = []
+
+        def display(rows, fmt):
+            for row in rows:
+                received.append(body.read_bytes)
+        with requests_mock.mock() as m, \
+                patch('vps.vultr.client._chunk_size', 1024), \
+                patch('vps.vultr.query.display', display):
+            m.get(requests_mock.ANY, body=body)
+            snapshots = snapshot_list(self.ctx)
+        self.assertEqual(5000, len(snapshots))
+        self.assertLess(received[0], body.read_bytes)
+
+    def test_criteria(self):
+        self.ctx.config.run.echo = False
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, text=json.dumps(_servers))
+            snapshots = snapshot_list(self.ctx,
+                                      criteria="{'ram': {'<': 3072}}")
+        self.assertEqual([_servers['0'], _servers['1'], _servers['2']],
+                         snapshots)
+
+    def test_empty_json(self):
+        self.ctx.config.output = {'format': 'json'}
+        out = io.StringIO()
+        with requests_mock.mock() as m, contextlib.redirect_stdout(out):
+            m.get(requests_mock.ANY, text='[]')
+            self.assertEqual([], snapshot_list(self.ctx))
+        self.assertEqual('[]\n', out.getvalue())
+
+    def test_error(self):
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, status_code=412, text='Invalid')
+            self.assertRaisesRegex(Exception, 'Invalid', snapshot_list,
+                                   self.ctx)
@@ -31,9 +31,44 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import ruamel.yaml
-from clint.textui import puts, columns
-from clint.textui.cols import console_width
+import csv
+import sys
+from itertools import chain, islice
+from .profiling import phase
+from .serializer import dumps
+
+# rows used to size the table columns, the rest are trimmed to fit
+_sample_size = 100
+
+formats = ('table', 'yaml', 'json', 'jsonl', 'csv', 'tsv')
+
+
+# clint and ruamel.yaml are imported on first use, as importing them slows
+# down the start of every command, even those not displaying anything
+def puts(*args, **kwargs):
+    from clint.textui import puts as _puts
+    # clint binds its default stream when imported, which now may happen
+    # while sys.stdout is redirected
+    kwargs.setdefault('stream', sys.stdout.write)
+    return _puts(*args, **kwargs)
+
+
+def console_width():
+    from clint.textui.cols import console_width as _console_width
+    return _console_width({})
+
+
+def _dump_yaml(a_dict):
+    import ruamel.yaml
+    return ruamel.yaml.dump(a_dict, Dumper=ruamel.yaml.RoundTripDumper)
+
+
+def get_format(ctx):
+    """
+    Output format selected with the global --format option
+    """
+    output = ctx.config.get('output') or {}
+    return output.get('format') or 'table'
 
 
 def get_headers(dl):
@@ -59,6 +94,21 @@ def column_size(headers, dl):
     return csize
 
 
+def _layout(dl):
+    """
+    Headers and column sizes of a list of dicts, in a single pass
+    """
+    csize = {}
+    for d in dl:
+        for key, value in d.items():
+            # initialize to the length of the key (header)
+            length = max(len(str(value)), len(key))
+            if length > csize.get(key, 0):
+                csize[key] = length
+    headers = sorted(csize)
+    return headers, csize
+
+
 def _trim(value, length):
     value = str(value)
     if len(value) > length:
@@ -68,29 +118,95 @@ def _trim(value, length):
 
 
 def display_yaml(a_dict):
-    puts(ruamel.yaml.dump(a_dict, Dumper=ruamel.yaml.RoundTripDumper))
+    with phase('render'):
+        puts(_dump_yaml(a_dict))
 
 
-def display(dl):
+def _plain(d):
+    # rows of a ResultSet are views, which the serializers do not know
+    return d if isinstance(d, dict) else dict(d)
+
+
+def _display_yaml_items(rows):
+    for d in rows:
+        key = d.get('label') or d.get('SUBID') or d.get('SCRIPTID')
+        puts(_dump_yaml({key: _plain(d)}), newline=False)
+
+
+def _display_json(rows, lines):
+    """
+    Writes one record at a time, so consumers can start processing them
+    before the whole result is written
+    """
+    out = sys.stdout
+    if not lines:
+        out.write('[')
+    for i, d in enumerate(rows):
+        if not lines and i:
+            out.write(',')
+        out.write(dumps(_plain(d)))
+        if lines:
+            out.write('\n')
+        out.flush()
+    if not lines:
+        out.write(']\n')
+
+
+def _display_csv(rows, headers, delimiter):
+    writer = csv.DictWriter(sys.stdout, headers, extrasaction='ignore',
+                            delimiter=delimiter, lineterminator='\n')
+    writer.writeheader()
+    for d in rows:
+        writer.writerow(d)
+    sys.stdout.flush()
+
+
+def display_empty(fmt, headers=()):
+    """
+    Displays an empty result in the machine readable formats, for scripts
+    parsing them: [] for json, and the header row, when headers are known,
+    for csv and tsv. Nothing is displayed in the rest
+    """
+    with phase('render'):
+        if fmt == 'json':
+            _display_json([], False)
+        elif fmt in ('csv', 'tsv') and headers:
+            _display_csv([], sorted(headers), ',' if fmt == 'csv' else '\t')
+
+
+def display(dl, fmt='table'):
     """
     Displays a list of dicts (dl) that contain same keys
+    Columns are sized after the first rows, so the output is written while
+    dl is consumed. Machine readable formats (json, jsonl, csv and tsv) are
+    written straight to stdout, one record at a time
     """
-    headers = get_headers(dl)
-    csize = column_size(headers, dl)
-    cons_width = console_width({})
-    values = csize.values()
-    content_width = sum(values)
+    with phase('render'):
+        _display(dl, fmt)
+
+
+def _display(dl, fmt):
+    rows = iter(dl)
+    if fmt in ('json', 'jsonl'):
+        return _display_json(rows, fmt == 'jsonl')
+    if fmt == 'yaml':
+        return _display_yaml_items(rows)
+    sample = list(islice(rows, _sample_size))
+    headers, csize = _layout(sample)
+    rows = chain(sample, rows)
+    if fmt in ('csv', 'tsv'):
+        return _display_csv(rows, headers, ',' if fmt == 'csv' else '\t')
+    cons_width = console_width()
+    content_width = sum(csize.values())
     if content_width > cons_width:
-        # if content is bigger than console, switch to yaml format
-        output = {}
-        for d in dl:
-            key = d.get('label') or d.get('SUBID') or d.get('SCRIPTID')
-            output[key] = d
-        puts(ruamel.yaml.dump(output, Dumper=ruamel.yaml.RoundTripDumper))
+        # if content is bigger than console, switch to yaml format, one
+        # document per item
+        _display_yaml_items(rows)
     else:
         # otherwise, print a table
+        from clint.textui import columns
         row = [[header, csize.get(header, '')] for header in headers]
         puts(columns(*row))
-        for d in dl:
+        for d in rows:
             row = [[_trim(d.get(h, ''), csize[h]), csize[h]] for h in headers]
             puts(columns(*row))
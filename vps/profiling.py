@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os.path
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+# phases timed while --timings is given, as {name: [calls, seconds]}
+_phases = None
+_phases_lock = threading.Lock()
+_nothing = nullcontext()
+
+# phases of the program, the rest happen while running the tasks
+_program_phases = ('config', 'import', 'tasks')
+
+
+class _Phase(object):
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start)
+
+
+def record(name, seconds):
+    if _phases is None:
+        return
+    with _phases_lock:
+        phase = _phases.setdefault(name, [0, 0.0])
+        phase[0] += 1
+        phase[1] += seconds
+
+
+def phase(name):
+    """
+    Context manager timing name, i.e. 'render' or each API call, while
+    timings are enabled. Otherwise, it is a shared context doing nothing
+    """
+    if _phases is None:
+        return _nothing
+    return _Phase(name)
+
+
+def timed(name, items):
+    """
+    Yields the items of an iterator, timing under name the time spent
+    producing them, i.e. receiving and decoding a streamed response, but not
+    the time spent by the consumer between them
+    """
+    if _phases is None:
+        yield from items
+        return
+    elapsed = 0.0
+    start = time.perf_counter()
+    try:
+        for item in items:
+            elapsed += time.perf_counter() - start
+            start = None
+            yield item
+            start = time.perf_counter()
+    finally:
+        if start is not None:
+            elapsed += time.perf_counter() - start
+        record(name, elapsed)
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        # built-in functions
+        return name
+    return '%s (%s:%d)' % (name, os.path.basename(filename), line)
+
+
+def collapsed_stacks(stats):
+    """
+    Lines 'root;caller;function microseconds', for flamegraph.pl, of the
+    pstats.Stats of a profile. cProfile keeps callers but not whole stacks,
+    so the time of a function is split among its callers in proportion to
+    the time it spent on behalf of each of them
+    """
+    entries = stats.stats
+    callees = {}
+    roots = []
+    for func, (_, _, _, _, callers) in entries.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    samples = {}
+
+    def walk(func, stack, share):
+        stack = stack + (func,)
+        own = entries[func][2] * share
+        if own > 0:
+            samples[stack] = samples.get(stack, 0.0) + own
+        for callee, callee_time in callees.get(func, ()):
+            total = entries[callee][3]
+            # recursive calls are already accounted for by the first one
+            if callee in stack or total <= 0 or callee_time * share < 1e-6:
+                continue
+            walk(callee, stack, callee_time * share / total)
+
+    for root in roots:
+        walk(root, (), 1.0)
+    lines = []
+    for stack, seconds in samples.items():
+        micros = int(round(seconds * 1e6))
+        if micros:
+            lines.append('%s %d' % (';'.join(map(_label, stack)), micros))
+    lines.sort()
+    return lines
+
+
+class Profiling(object):
+    """
+    Profilers selected with the global --profile, --profile-stacks,
+    --timings and --memory options, around the run of a program
+    """
+
+    def __init__(self, started, profile=None, stacks=None, timings=False,
+                 memory=False):
+        self.started = started
+        self.profile = profile
+        self.stacks = stacks
+        self.timings = timings
+        self.memory = memory
+        self.profiler = None
+
+    def start(self, done):
+        """
+        done gives the seconds of the phases finished before the options
+        were parsed, i.e. importing the tasks
+        """
+        global _phases
+        if self.timings:
+            _phases = {}
+            for name, seconds in done.items():
+                record(name, seconds)
+        if self.memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.profile or self.stacks:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self, out=None):
+        global _phases
+        total = time.perf_counter() - self.started
+        if self.profiler:
+            self.profiler.disable()
+            self._write_profile()
+        peak = None
+        if self.memory:
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        phases, _phases = _phases, None
+        if self.timings or self.memory:
+            self._report(out or sys.stderr, phases or {}, total, peak)
+
+    def _write_profile(self):
+        import pstats
+        stats = pstats.Stats(self.profiler)
+        if self.profile:
+            stats.dump_stats(self.profile)
+        if self.stacks:
+            with open(self.stacks, 'w') as f:
+                for line in collapsed_stacks(stats):
+                    f.write(line + '\n')
+
+    def _report(self, out, phases, total, peak):
+        # written to stderr, not to get mixed with the output of the tasks
+        rows = [(name, phases[name]) for name in _program_phases
+                if name in phases]
+        rows += [('  ' + name, value) for name, value in phases.items()
+                 if name not in _program_phases]
+        width = max([len(name) for name, _ in rows] + [len('peak memory')])
+        if self.timings:
+            out.write('%-*s %6s %10s\n' % (width, 'phase', 'calls', 'seconds'))
+            for name, (calls, seconds) in rows:
+                out.write('%-*s %6d %10.3f\n' % (width, name, calls, seconds))
+            out.write('%-*s %6s %10.3f\n' % (width, 'total', '', total))
+        if peak is not None:
+            out.write('%-*s %6s %8.1fMB\n' % (width, 'peak memory', '',
+                                              peak / 1024 / 1024))
+        out.flush()
@@ -31,26 +31,124 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from invoke import Program
+import time
+from importlib import import_module
+from invoke import Argument, Program
+from invoke.config import copy_dict, merge_dicts
+from invoke.exceptions import ParseError
+from .console import formats
+from .profiling import Profiling, phase
 from .version import __version__
-from .tool.tasks import collection as tool_coll
-from .status import collection as status_coll
-from .vultr.tasks import collection as vultr_coll
-
-vultr = Program(binary='vultr',
-                name='vultr',
-                namespace=vultr_coll,
-                version=__version__,
-                )
-
-status = Program(binary='vps-status',
-                 name='vps-status',
-                 namespace=status_coll,
+
+
+class _Program(Program):
+    """
+    Program with the global options shared by vps, vultr and vps-status
+    The namespace is given as the name of the module defining the collection
+    and only imported when needed, so vultr does not pay for the modules of
+    vps and vice versa
+    The profilers given with --profile, --profile-stacks, --timings and
+    --memory are only imported and started when asked for
+    """
+
+    _profiling = None
+    # phases done before the options are parsed, timed anyway
+    _config_seconds = 0.0
+    _import_seconds = 0.0
+
+    @property
+    def namespace(self):
+        if isinstance(self._namespace, str):
+            start = time.perf_counter()
+            self._namespace = import_module(self._namespace).collection
+            self._import_seconds = time.perf_counter() - start
+        return self._namespace
+
+    @namespace.setter
+    def namespace(self, value):
+        self._namespace = value
+
+    def core_args(self):
+        core_args = super(_Program, self).core_args()
+        extra_args = [
+            Argument(names=('format', 'o'),
+                     help='Output format of listings: %s' % ', '.join(formats)),
+            Argument(names=('profile',),
+                     help='Write a cProfile of the run to this .pstats file'),
+            Argument(names=('profile-stacks',),
+                     help='Write the profile as collapsed stacks to this ' +
+                     'file, for flamegraph.pl'),
+            Argument(names=('timings',), kind=bool,
+                     help='Print the time spent importing, loading the ' +
+                     'config, in each API call and rendering to stderr'),
+            Argument(names=('memory',), kind=bool,
+                     help='Print the peak memory allocated, traced with ' +
+                     'tracemalloc, to stderr. Slows down the run'),
+        ]
+        return core_args + extra_args
+
+    def run(self, argv=None, exit=True):
+        self._started = time.perf_counter()
+        try:
+            return super(_Program, self).run(argv, exit)
+        finally:
+            if self._profiling:
+                self._profiling.stop()
+                self._profiling = None
+
+    def create_config(self):
+        start = time.perf_counter()
+        super(_Program, self).create_config()
+        self._config_seconds = time.perf_counter() - start
+
+    def parse_core(self, argv):
+        super(_Program, self).parse_core(argv)
+        args = self.args
+        options = dict(profile=args.profile.value,
+                       stacks=args['profile-stacks'].value,
+                       timings=args.timings.value,
+                       memory=args.memory.value)
+        if any(options.values()):
+            self._profiling = Profiling(self._started, **options)
+            self._profiling.start({'config': self._config_seconds,
+                                   'import': self._import_seconds})
+
+    def execute(self):
+        with phase('tasks'):
+            return super(_Program, self).execute()
+
+    def update_config(self, merge=True):
+        with phase('config'):
+            self._update_config(merge)
+
+    def _update_config(self, merge):
+        super(_Program, self).update_config(merge=False)
+        fmt = self.args.format.value
+        if fmt:
+            if fmt not in formats:
+                raise ParseError("'%s' is not a valid output format" % fmt)
+            # load_overrides replaces the whole level, i.e. --dry or --hide
+            overrides = copy_dict(self.config._overrides)
+            merge_dicts(overrides, {'output': {'format': fmt}})
+            self.config.load_overrides(overrides, merge=False)
+        if merge:
+            self.config.merge()
+
+
+vultr = _Program(binary='vultr',
+                 name='vultr',
+                 namespace='vps.vultr.tasks',
                  version=__version__,
                  )
 
-vps = Program(binary='vps',
-              name='vps',
-              namespace=tool_coll,
-              version=__version__,
-              )
+status = _Program(binary='vps-status',
+                  name='vps-status',
+                  namespace='vps.status',
+                  version=__version__,
+                  )
+
+vps = _Program(binary='vps',
+               name='vps',
+               namespace='vps.tool.tasks',
+               version=__version__,
+               )
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import json
+import re
+from collections import namedtuple
+from os import environ
+
+# orjson is used when installed, set VPS_JSON=json to use the standard library
+_preferred = environ.get('VPS_JSON', 'orjson')
+
+Backend = namedtuple('Backend', ('name', 'loads', 'dumps'))
+
+_backend = None
+
+_non_ascii = re.compile(r'[^\x00-\x7f]')
+
+
+def _escape(match):
+    # as json.dumps does with ensure_ascii, surrogate pairs above U+FFFF
+    code = ord(match.group())
+    if code > 0xffff:
+        code -= 0x10000
+        return '\\u%04x\\u%04x' % (0xd800 | code >> 10, 0xdc00 | code & 0x3ff)
+    return '\\u%04x' % code
+
+
+def _json():
+    return Backend('json', json.loads, json.dumps)
+
+
+def _orjson():
+    import orjson
+    options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        try:
+            text = orjson.dumps(obj, option=options).decode('utf-8')
+        except TypeError:
+            # i.e. integers over 64 bits
+            return json.dumps(obj)
+        # ASCII only, like the standard library, so that it can be written
+        # to any stdout. Non ASCII characters can only appear in strings
+        if not text.isascii():
+            text = _non_ascii.sub(_escape, text)
+        return text
+    return Backend('orjson', orjson.loads, dumps)
+
+
+_backends = {
+    'json': _json,
+    'orjson': _orjson,
+}
+
+
+def get_backend(name=None):
+    """
+    JSON backend called name or, by default, the one given by VPS_JSON when
+    it is installed. The standard library is the fallback
+    """
+    global _backend
+    if name is None and _backend is not None:
+        return _backend
+    try:
+        backend = _backends.get(name or _preferred, _json)()
+    except ImportError:
+        backend = _json()
+    if name is None:
+        _backend = backend
+    return backend
+
+
+def loads(data):
+    """
+    Decodes JSON given as str or bytes
+    """
+    return get_backend().loads(data)
+
+
+def dumps(obj):
+    """
+    Encodes obj as ASCII only JSON text. The standard library writes ', '
+    and ': ' as separators and NaN or Infinity for those floats, while
+    orjson writes no spaces and null instead
+    """
+    return get_backend().dumps(obj)
@@ -32,8 +32,8 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import math
-from clint.textui import puts, indent, colored
 from invoke import task, Collection
+from vps.console import puts
 from vps.vultr.tasks import collection as vultr_collection
 
 
@@ -112,6 +112,7 @@ def _compare_apis(spec, impl):
 
 
 def _fmt_percentage(p):
+    from clint.textui import colored
     fmt_percentage = '%0.2f' % p
     if math.isclose(p, 1):
         fmt_percentage = colored.green(fmt_percentage)
@@ -121,6 +122,7 @@ def _fmt_percentage(p):
 
 
 def _display(api, total_percentage, comp):
+    from clint.textui import indent
     puts('%s: %s' % (api, _fmt_percentage(total_percentage)))
     with indent(4):
         for obj, percentage in comp.items():
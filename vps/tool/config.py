@@ -33,7 +33,7 @@
 
 import inspect
 import os.path
-from clint.textui import puts, colored
+from vps.console import puts
 
 
 class require_config(object):
@@ -54,6 +54,7 @@ class require_config(object):
                 return f(ctx, *args, **kwargs)
             else:
                 if ctx.config.run.echo:
+                    from clint.textui import colored
                     puts("'%s' missing" % colored.red(self.__path))
 
         _f.__doc__ = inspect.getdoc(f)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import time
+from datetime import datetime
+from invoke import task, Collection, Context
+from vps.console import display_yaml
+from vps.vultr import cache
+from vps.vultr.key import get_key
+from vps.vultr.server import server_list
+
+# snapshots by API key, as {'created': timestamp, 'servers': [...]}
+_snapshots = {}
+# fields of server.list not written to the cache, which is plain text
+_secret_fields = ('default_password', 'kvm_url')
+
+
+def _params():
+    # the account is part of the cache entry name, hashed
+    return {'api_key': get_key()}
+
+
+def fetch(ctx):
+    """
+    Queries server.list and stores the result as the latest snapshot, in
+    memory and, if the cache is enabled, on disk
+    """
+    # we do not want to display the result of the query
+    query_ctx = Context()
+    query_ctx.config.run.echo = False
+    servers = server_list(query_ctx)
+    if servers is None:
+        # API key missing
+        return None
+    snapshot = {'created': time.time(), 'servers': servers}
+    _snapshots[get_key()] = snapshot
+    stored = dict(snapshot, servers=[
+        {k: v for k, v in s.items() if k not in _secret_fields}
+        for s in servers])
+    cache.store(ctx, 'server.list', stored, _params())
+    return servers
+
+
+def get_servers(ctx, max_age=0):
+    """
+    Servers in the account. The latest snapshot is used when it is not older
+    than max_age seconds; otherwise, or with max_age 0, server.list is queried
+    """
+    if max_age > 0:
+        snapshot = _snapshots.get(get_key())
+        if snapshot is None or time.time() - snapshot['created'] > max_age:
+            snapshot = cache.load(ctx, 'server.list', max_age, _params())
+        if snapshot is not None and \
+                time.time() - snapshot['created'] <= max_age:
+            _snapshots[get_key()] = snapshot
+            return snapshot['servers']
+    return fetch(ctx)
+
+
+def invalidate(ctx):
+    """
+    Drops the latest snapshot, once servers have been created or destroyed
+    """
+    _snapshots.pop(get_key(), None)
+    cache.discard(ctx, 'server.list', _params())
+
+
+@task(name='refresh',
+      help={})
+def inventory_refresh(ctx):
+    """
+    Query the servers in the account and store them, so that the following
+    commands given --max-age reuse them instead of querying Vultr again
+    """
+    servers = fetch(ctx)
+    if servers is not None and ctx.config.run.echo:
+        created = _snapshots[get_key()]['created']
+        display_yaml({
+            'Servers': len(servers),
+            'Snapshot': datetime.fromtimestamp(created).isoformat(' ', 'seconds'),
+        })
+    return servers
+
+inventory_coll = Collection()
+inventory_coll.add_task(inventory_refresh)
@@ -31,33 +31,125 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import hashlib
+import json
 import os.path
-import ruamel.yaml
-from invoke import task, Collection
+from functools import partial
+from invoke import task, Collection, Context
+from vps.console import display_yaml
+from vps.files import locked, read_text, replace
+from vps.vultr.criteria import compile_criteria, index
+from vps.vultr.key import get_key
 from vps.vultr.os import os_list
 from vps.vultr.plans import plans_list
 from vps.vultr.regions import regions_list
-from vps.vultr.server import server_create
+from vps.vultr.server import server_create, server_destroy
+from .batch import run_batch
 from .config import require_config
+from .inventory import fetch, invalidate
+
+# servers created by provision.vultr, as {account: {SUBID: label}}. --prune
+# only destroys these, never servers created by other means
+_state_path = os.path.join(os.path.expanduser('~'), '.vps', 'provisioned.json')
+
+
+def _account():
+    # the API key itself is not stored
+    return hashlib.sha1(get_key().encode('utf-8')).hexdigest()[:12]
+
+
+def _load_state():
+    try:
+        return json.loads(read_text(_state_path) or '{}')
+    except ValueError:
+        return {}
+
+
+def _created_servers():
+    """
+    SUBIDs, with their labels, of the servers created by provision.vultr in
+    the account
+    """
+    return _load_state().get(_account(), {})
+
+
+def _record(created, destroyed):
+    """
+    Adds the servers created, as {SUBID: label}, and removes the SUBIDs
+    destroyed from the servers created by provision.vultr
+    """
+    with locked(_state_path):
+        state = _load_state()
+        servers = state.setdefault(_account(), {})
+        servers.update(created)
+        for subid in destroyed:
+            servers.pop(subid, None)
+        replace(_state_path, json.dumps(state, indent=2, sort_keys=True),
+                0o600)
+
+
+class _Catalog(object):
+    """
+    Regions, plans or os available in Vultr. The list is downloaded once, on
+    the first lookup, and indexed by every field used in the criteria
+    """
+
+    def __init__(self, ctx, query, refresh=False):
+        self.ctx = ctx
+        self.query = query
+        self.refresh = refresh
+        self._items = None
+        self._indexes = {}
+
+    def _get_items(self):
+        if self._items is None:
+            self._items = self.query(self.ctx, refresh=self.refresh) or []
+        return self._items
+
+    def find(self, criteria):
+        """
+        Returns the items matching criteria
+        """
+        compiled = compile_criteria(criteria)
+        for field in compiled.equalities:
+            if field not in self._indexes:
+                self._indexes[field] = index(self._get_items(), field)
+        return compiled.select(self._get_items(), self._indexes)
 
 
 class _VultrProvision(object):
 
     cfg_path = os.path.join('.vps', 'vultr')
+    # fields of existing servers compared against the config when reconciling
+    compared = (('dcid', 'DCID'), ('vpsplanid', 'VPSPLANID'), ('osid', 'OSID'),
+                ('tag', 'tag'))
 
-    def __init__(self, ctx):
+    def __init__(self, ctx, refresh=False, jobs=1, rate=1.0, reconcile=False,
+                 prune=False, plan_only=False, confirmed=False):
         self.ctx = ctx
+        self.jobs = jobs
+        self.rate = rate
+        self.reconcile = reconcile or prune or plan_only
+        self.prune = prune
+        self.plan_only = plan_only
+        self.confirmed = confirmed
+        # catalogs and single creates are not displayed, only the summary
+        self.query_ctx = Context(ctx.config.clone())
+        self.query_ctx.config.run.echo = False
+        self.regions = _Catalog(self.query_ctx, regions_list, refresh)
+        self.plans = _Catalog(self.query_ctx, plans_list, refresh)
+        self.os = _Catalog(self.query_ctx, os_list, refresh)
 
     def _read_cfg(self):
         path = os.path.join(os.path.expanduser('~'), _VultrProvision.cfg_path)
         with open(path, 'r') as f:
             return f.read()
 
-    def _get_id(self, cfg, label, dyn_label, query):
+    def _get_id(self, cfg, label, dyn_label, catalog):
         id = cfg.pop(label, None)
         if not id:
             criteria = cfg.pop(dyn_label)
-            value = query(self.ctx, criteria)
+            value = catalog.find(criteria)
             if len(value) > 1:
                 msg = 'Criteria for %s(%s) returned multiple values' % (dyn_label, str(criteria))
                 raise ValueError(msg)
@@ -71,28 +163,179 @@ class _VultrProvision(object):
             cfg.pop(dyn_label, None)
         return id
 
+    def _resolve(self, cfg):
+        """
+        Resolves the whole config first, so mistakes are found before any
+        server gets created
+        """
+        creates = []
+        for label in cfg:
+            vm_cfg = cfg[label]
+            dcid = self._get_id(vm_cfg, 'dcid', 'region', self.regions)
+            planid = self._get_id(vm_cfg, 'vpsplanid', 'plan', self.plans)
+            osid = self._get_id(vm_cfg, 'osid', 'os', self.os)
+            # we need to add the label to the params dict
+            cfg[label]['label'] = label
+            creates.append((label, (dcid, planid, osid, cfg[label])))
+        return creates
+
+    def _changes(self, server, args):
+        dcid, planid, osid, params = args
+        wanted = {'dcid': dcid, 'vpsplanid': planid, 'osid': osid}
+        if params.get('tag') is not None:
+            wanted['tag'] = params['tag']
+        changes = {}
+        for key, field in self.compared:
+            if key in wanted and str(wanted[key]) != str(server.get(field)):
+                changes[field] = '%s -> %s' % (server.get(field), wanted[key])
+        return changes
+
+    def _plan(self, creates, servers):
+        """
+        Compares the resolved config with the servers in the account, indexed
+        by label. Servers whose region, plan, os or tag differ from the config
+        are reported as changed, but left untouched. Only servers created by
+        provision.vultr are destroyed when pruning
+        """
+        owned = _created_servers()
+        by_label = {}
+        for server in servers:
+            by_label.setdefault(server.get('label'), []).append(server)
+        plan = {'create': [], 'keep': {}, 'changed': {}, 'destroy': []}
+        for label, args in creates:
+            existing = by_label.pop(label, None)
+            if not existing:
+                plan['create'].append((label, args))
+                continue
+            server = existing[0]
+            changes = self._changes(server, args)
+            if changes:
+                plan['changed'][label] = changes
+            else:
+                plan['keep'][label] = server['SUBID']
+            # duplicates left behind by previous runs
+            plan['destroy'].extend((label, s['SUBID']) for s in existing[1:]
+                                   if s['SUBID'] in owned)
+        for label, unlisted in by_label.items():
+            plan['destroy'].extend((label, s['SUBID']) for s in unlisted
+                                   if s['SUBID'] in owned)
+        if not self.prune:
+            plan['destroy'] = []
+        return plan
+
+    def _display_plan(self, plan):
+        display_yaml({'Plan': {
+            'create': [label for label, _ in plan['create']],
+            'keep': list(plan['keep']),
+            'changed': plan['changed'],
+            'destroy': ['%s (%s)' % d for d in plan['destroy']],
+        }})
+
+    def _create(self, args):
+        dcid, planid, osid, params = args
+        return server_create(self.query_ctx, dcid, planid, osid, **params)
+
+    def _summary(self, results, errors, destroyed=None):
+        summary = {}
+        summary['Created servers'] = {
+            label: (response or {}).get('SUBID')
+            for label, response in results.items()}
+        if destroyed is not None:
+            summary['Destroyed servers'] = destroyed
+        summary['Failed servers'] = {label: str(e)
+                                     for label, e in errors.items()}
+        display_yaml(summary)
+
+    def _apply(self, creates, destroys=None):
+        results, errors = run_batch(self._create, creates,
+                                    self.jobs, self.rate)
+        changed = bool(results)
+        created = {response['SUBID']: label
+                   for label, response in results.items()
+                   if response and response.get('SUBID')}
+        destroyed = None
+        if destroys is not None:
+            destroyed = {}
+            destroy = partial(server_destroy, self.query_ctx)
+            items = [(subid, subid) for _, subid in destroys]
+            labels = {subid: label for label, subid in destroys}
+            done, failed = run_batch(destroy, items, self.jobs, self.rate)
+            for subid in done:
+                destroyed[labels[subid]] = subid
+            changed = changed or bool(done)
+            for subid, e in failed.items():
+                errors['%s (%s)' % (labels[subid], subid)] = e
+        if changed:
+            _record(created, destroyed.values() if destroyed else ())
+            invalidate(self.ctx)
+        if self.ctx.config.run.echo:
+            self._summary(results, errors, destroyed)
+        if errors:
+            msg = 'Failed to apply: ' if destroys else 'Failed to create: '
+            raise RuntimeError(msg + ', '.join(errors.keys()))
+
     def run(self):
+        """
+        Creates the servers in the config. When reconciling, the servers in
+        the account are listed once and only the missing servers are created
+        (and, when pruning, the ones not in the config destroyed, once
+        confirmed). Returns the plan when reconciling
+        """
+        import ruamel.yaml
         txt_cfg = self._read_cfg()
         cfg = ruamel.yaml.load(txt_cfg, ruamel.yaml.RoundTripLoader)
-        if cfg:
-            for label in cfg:
-                vm_cfg = cfg[label]
-                dcid = self._get_id(vm_cfg, 'dcid', 'region', regions_list)
-                planid = self._get_id(vm_cfg, 'vpsplanid', 'plan', plans_list)
-                osid = self._get_id(vm_cfg, 'osid', 'os', os_list)
-                # we need to add the label to the params dict
-                cfg[label]['label'] = label
-                server_create(self.ctx, dcid, planid, osid, **cfg[label])
+        if not self.reconcile:
+            if cfg:
+                self._apply(self._resolve(cfg))
+            return None
+        servers = fetch(self.ctx)
+        if servers is None:
+            # API key missing
+            return None
+        creates = self._resolve(cfg or {})
+        if self.prune and not creates:
+            # a missing or mistyped config would destroy every server
+            raise ValueError('Refusing to prune: no servers in %s' %
+                             _VultrProvision.cfg_path)
+        plan = self._plan(creates, servers)
+        if self.ctx.config.run.echo:
+            self._display_plan(plan)
+        if plan['destroy'] and not (self.plan_only or self.confirmed):
+            raise RuntimeError('Pass --yes to destroy %d servers, or check '
+                               'them first with --plan' % len(plan['destroy']))
+        if not self.plan_only and (plan['create'] or plan['destroy']):
+            self._apply(plan['create'], plan['destroy'])
+        return plan
 
 
 @task(name='vultr',
-      help={})
+      help={
+          'refresh': 'Ignore cached regions, plans and os lists',
+          'jobs': 'Number of servers created in parallel. Only up to ' +
+          'VPS_HTTP_POOL_SIZE connections are kept alive',
+          'rate': 'Maximum number of create requests started per second',
+          'reconcile': 'Only create the servers whose label is not in the ' +
+          'account yet',
+          'plan': 'Display what reconcile would do, without doing it',
+          'prune': 'Reconcile, and destroy the servers not in the config ' +
+          'created by provision.vultr, as recorded in ~/.vps/provisioned.json',
+          'yes': 'Confirm the servers destroyed by --prune',
+      })
 @require_config(_VultrProvision.cfg_path)
-def provision_vultr(ctx):
+def provision_vultr(ctx, refresh=False, jobs=1, rate=1.0, reconcile=False,
+                    plan=False, prune=False, yes=False):
     """
     Provision Vultr servers based on ~/.vps/vultr
+    Servers failing to be created do not stop the rest of the batch
+    With --reconcile, the servers in the account are listed once and compared
+    with the config by label: only missing servers are created, so running
+    it again on a converged config does nothing. Servers with a different
+    region, plan, os or tag are reported as changed, but not modified
+    The servers created are recorded in ~/.vps/provisioned.json. --prune
+    only destroys those, and only with --yes
     """
-    return _VultrProvision(ctx).run()
+    return _VultrProvision(ctx, refresh, jobs, rate, reconcile, prune,
+                           plan, yes).run()
 
 
 provision_coll = Collection()
@@ -31,30 +31,133 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from invoke import task, Collection, Context
-from vps.console import display_yaml
-from vps.vultr.server import server_list
+import json
+import os.path
+import re
+from invoke import task, Collection
+from vps.console import puts
+from vps.files import read_text, replace
+from .inventory import get_servers
+
+# strings that can be written without quotes, unless yaml would read them
+# as something else (i.e. numbers, booleans or dates). No yaml indicator is
+# allowed, not even ':' inside the string: anything else is double quoted
+_plain = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_./@-]*$')
+_special = re.compile(r'^(y|n|yes|no|true|false|on|off|null|[-+0-9_]+|'
+                      r'0[xob][0-9a-f_]+)$', re.IGNORECASE)
+
+
+def _scalar(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    value = str(value)
+    try:
+        float(value.replace('_', ''))
+        number = True
+    except ValueError:
+        number = False
+    if _plain.match(value) and not _special.match(value) and not number:
+        return value
+    # json strings are valid yaml double quoted scalars
+    return json.dumps(value)
+
+
+def _grains(tag):
+    """
+    Grains from the tag of a server: key=value pairs separated by commas
+    become grains, other words go to the 'tags' grain
+    """
+    grains = {}
+    for item in (tag or '').split(','):
+        item = item.strip()
+        if '=' in item:
+            key, value = item.split('=', 1)
+            grains[key.strip()] = value.strip()
+        elif item:
+            grains.setdefault('tags', []).append(item)
+    return grains
+
+
+def _entry(server, user, port, priv, sudo, grains):
+    entry = {'host': server['main_ip'], 'user': user}
+    if port != 22:
+        entry['port'] = port
+    if priv:
+        entry['priv'] = priv
+    if sudo:
+        entry['sudo'] = True
+    if grains:
+        server_grains = _grains(server.get('tag'))
+        if server_grains:
+            entry['minion_opts'] = {'grains': server_grains}
+    return entry
+
+
+def _render(roster):
+    """
+    Yields the roster in yaml, one server at a time. Entries are plain enough
+    to not need a yaml library, which is too slow for large fleets: ruamel
+    takes seconds to dump 10k servers
+    """
+    for label, entry in roster.items():
+        lines = ['%s:' % _scalar(label)]
+        for key, value in entry.items():
+            if key != 'minion_opts':
+                lines.append('  %s: %s' % (key, _scalar(value)))
+                continue
+            lines.append('  minion_opts:')
+            lines.append('    grains:')
+            for grain, grain_value in value['grains'].items():
+                if isinstance(grain_value, list):
+                    lines.append('      %s:' % _scalar(grain))
+                    lines.extend('      - %s' % _scalar(v) for v in grain_value)
+                else:
+                    lines.append('      %s: %s' % (_scalar(grain),
+                                                   _scalar(grain_value)))
+        yield '\n'.join(lines) + '\n'
 
 
 @task(name='roster',
-      help={})
-def salt_roster(ctx):
+      help={
+          'output': 'Roster file to write. It is only rewritten when the ' +
+          'roster changes',
+          'user': 'User to log in as',
+          'port': 'ssh port',
+          'priv': 'Private key to log in with',
+          'sudo': 'Run commands with sudo',
+          'grains': 'Add grains from the tag of each server: ' +
+          'role=web,env=prod becomes the grains role and env, other words ' +
+          'are added to the grain tags',
+          'max_age': 'Reuse the servers fetched by a previous command ' +
+          '(see inventory.refresh) if not older than these seconds',
+      })
+def salt_roster(ctx, output=None, user='root', port=22, priv=None,
+                sudo=False, grains=False, max_age=0):
     """
     Query the available servers and present the information in yaml format
+    With --output, the roster is written to a file instead, atomically. The
+    file is left untouched when its content would not change
     """
     roster = {}
-    # we do not want to display the result of the query
-    query_ctx = Context()
-    query_ctx.config.run.echo = False
-    servers = server_list(query_ctx)
+    servers = get_servers(ctx, max_age)
     if servers:
         for server in servers:
-            label = server['label']
-            roster[label] = {}
-            roster[label]['host'] = server['main_ip']
-            roster[label]['user'] = 'root'
-    if ctx.config.run.echo:
-        display_yaml(roster)
+            roster[server['label']] = _entry(server, user, port, priv, sudo,
+                                             grains)
+    if output:
+        path = os.path.expanduser(output)
+        text = ''.join(_render(roster))
+        changed = text != read_text(path)
+        if changed:
+            replace(path, text)
+        if ctx.config.run.echo:
+            msg = '%s written' if changed else '%s unchanged'
+            puts(msg % output)
+    elif ctx.config.run.echo:
+        for chunk in _render(roster):
+            puts(chunk, newline=False)
     return roster
 
 salt_coll = Collection()
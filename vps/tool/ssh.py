@@ -31,13 +31,26 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from invoke import task, Collection, Context
-from vps.console import puts
-from vps.vultr.server import server_list
+import asyncio
+import json
+import os.path
+from invoke import task, Collection
+from vps.console import display_yaml, puts
+from vps.files import locked, read_text, replace
+from .inventory import get_servers
+
+_known_hosts = os.path.join('~', '.ssh', 'known_hosts')
+# ip and label of the hosts scanned, by known_hosts file
+_state_path = os.path.join(os.path.expanduser('~'), '.vps', 'keyscan.json')
+# seconds before scanning a host again, doubled after each attempt
+_retry_delay = 5
 
 @task(name='list',
-      help={})
-def ssh_list(ctx):
+      help={
+          'max_age': 'Reuse the servers fetched by a previous command ' +
+          '(see inventory.refresh) if not older than these seconds',
+      })
+def ssh_list(ctx, max_age=0):
     """
     Lists the servers to ssh, in ssh-keyscan format
     To execute, run:
@@ -47,10 +60,7 @@ def ssh_list(ctx):
     $ ssh-keyscan -t ecdsa `vps ssh.list` >> ~/.ssh/known_hosts
     """
     hosts = []
-    # we do not want to display the result of the query
-    query_ctx = Context()
-    query_ctx.config.run.echo = False
-    servers = server_list(query_ctx)
+    servers = get_servers(ctx, max_age)
     if servers:
         for server in servers:
             label = server['label']
@@ -60,6 +70,147 @@ def ssh_list(ctx):
         puts('\n'.join(hosts))
     return hosts
 
+
+def _load_state(known_hosts):
+    try:
+        with open(_state_path, 'r') as f:
+            return json.load(f).get(known_hosts, {})
+    except (IOError, ValueError):
+        return {}
+
+
+def _save_state(known_hosts, hosts):
+    try:
+        with open(_state_path, 'r') as f:
+            state = json.load(f)
+    except (IOError, ValueError):
+        state = {}
+    state[known_hosts] = hosts
+    replace(_state_path, json.dumps(state, indent=2, sort_keys=True), 0o600)
+
+
+async def _scan(ip, key_type, timeout):
+    """
+    Public keys of a host, as 'type key' strings
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'ssh-keyscan', '-T', str(timeout), '-t', key_type, ip,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    except FileNotFoundError:
+        raise RuntimeError('ssh-keyscan not found, install the OpenSSH '
+                           'client or add it to the PATH')
+    out, _ = await process.communicate()
+    keys = []
+    for line in out.decode().splitlines():
+        fields = line.split()
+        if len(fields) >= 3 and not line.startswith('#'):
+            keys.append(' '.join(fields[1:3]))
+    return keys
+
+
+async def _scan_retrying(ip, key_type, timeout, retries):
+    # servers just created may not be listening yet
+    for attempt in range(retries):
+        keys = await _scan(ip, key_type, timeout)
+        if keys or attempt + 1 == retries:
+            return keys
+        await asyncio.sleep(_retry_delay * 2 ** attempt)
+
+
+def _scan_all(hosts, key_type, timeout, retries, jobs):
+    from vps.vultr import aio
+    aws = [_scan_retrying(ip, key_type, timeout, retries)
+           for ip in hosts.values()]
+    return dict(zip(hosts, aio.run(aio.gather(aws, limit=jobs))))
+
+
+def _merge(lines, hosts, keys):
+    """
+    known_hosts lines without the previous entries of the hosts, plus their
+    new keys. Duplicated lines are dropped
+    """
+    names = set(hosts) | set(hosts.values())
+    merged = []
+    for line in lines:
+        fields = line.split()
+        if fields and not line.startswith('#') and \
+                names.intersection(fields[0].split(',')):
+            continue
+        merged.append(line)
+    for label, host_keys in keys.items():
+        for key in host_keys:
+            merged.append('%s,%s %s' % (hosts[label], label, key))
+    seen = set()
+    return [line for line in merged
+            if not (line in seen or seen.add(line))]
+
+
+@task(name='keyscan',
+      help={
+          'known_hosts': 'File to update, by default ~/.ssh/known_hosts',
+          'key_type': 'Type of key to fetch, as in ssh-keyscan -t',
+          'timeout': 'Seconds to wait for each host, as in ssh-keyscan -T',
+          'retries': 'Attempts per host, for servers not listening yet',
+          'jobs': 'Number of hosts scanned in parallel',
+          'force': 'Scan every server, even those scanned before',
+          'max_age': 'Reuse the servers fetched by a previous command ' +
+          '(see inventory.refresh) if not older than these seconds',
+      })
+def ssh_keyscan(ctx, known_hosts=_known_hosts, key_type='ecdsa', timeout=5,
+                retries=3, jobs=10, force=False, max_age=0):
+    """
+    Scans the ssh keys of the servers and stores them in known_hosts
+    Hosts are scanned in parallel. Only servers which are new, or whose ip or
+    label changed since the last scan, are scanned again. Previous keys of
+    the scanned hosts are replaced, and the file is updated atomically
+    """
+    servers = get_servers(ctx, max_age)
+    if servers is None:
+        # API key missing
+        return None
+    path = os.path.abspath(os.path.expanduser(known_hosts))
+    lines = (read_text(path) or '').splitlines()
+    known = {line.split()[0] for line in lines
+             if line.strip() and line[0] != '#'}
+    state = {} if force else _load_state(path)
+    hosts = {}
+    unchanged = []
+    failed = []
+    for server in servers:
+        label, ip = server['label'], server['main_ip']
+        if ip in ('', '0', '0.0.0.0'):
+            # no ip assigned yet
+            failed.append(label)
+        elif state.get(label) == ip and '%s,%s' % (ip, label) in known:
+            unchanged.append(label)
+        else:
+            hosts[label] = ip
+    keys = _scan_all(hosts, key_type, timeout, retries, jobs) if hosts else {}
+    scanned = {label: hosts[label] for label, k in keys.items() if k}
+    failed = sorted(failed + [label for label, k in keys.items() if not k])
+    if scanned:
+        keys = {label: keys[label] for label in scanned}
+        current = {s['label']: s['main_ip'] for s in servers}
+        # the state file lock also covers known_hosts
+        with locked(_state_path):
+            # another run may have updated both files while scanning
+            lines = (read_text(path) or '').splitlines()
+            replace(path, '\n'.join(_merge(lines, scanned, keys)) + '\n',
+                    0o600)
+            state = {label: ip for label, ip in _load_state(path).items()
+                     if current.get(label) == ip}
+            state.update(scanned)
+            _save_state(path, state)
+    if ctx.config.run.echo:
+        display_yaml({'Scanned hosts': scanned,
+                      'Unchanged hosts': unchanged,
+                      'Failed hosts': failed})
+    if failed:
+        raise RuntimeError('Failed to scan: %s' % ', '.join(failed))
+    return scanned
+
 ssh_coll = Collection()
 ssh_coll.add_task(ssh_list)
+ssh_coll.add_task(ssh_keyscan)
 
@@ -32,20 +32,27 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import Collection
+from .inventory import inventory_coll
 from .provision import provision_coll
 from .salt import salt_coll
 from .ssh import ssh_coll
+from .wait import wait_coll
 from .wipe import wipe_coll
 
 
 collection = Collection()
+collection.add_collection(inventory_coll, name='inventory')
 collection.add_collection(provision_coll, name='provision')
 collection.add_collection(salt_coll, name='salt')
 collection.add_collection(ssh_coll, name='ssh')
+collection.add_collection(wait_coll, name='wait')
 collection.add_collection(wipe_coll, name='wipe')
 
 collection.configure({
     'run': {
         'echo': True
+    },
+    'cache': {
+        'enabled': True
     }
 })
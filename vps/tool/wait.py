@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import time
+from collections import OrderedDict
+from invoke import task, Collection, Context
+from vps.console import display_yaml, puts
+from vps.vultr.server import server_list
+
+
+def _is_ready(server):
+    return server.get('status') == 'active' and \
+        server.get('power_status') == 'running' and \
+        server.get('server_state') == 'ok'
+
+
+@task(name='vultr',
+      help={
+          'subid': 'Comma separated SUBIDs to wait for. By default, all ' +
+          'servers in the account',
+          'timeout': 'Seconds to wait before giving up',
+          'interval': 'Initial seconds between polls',
+          'max_interval': 'Maximum seconds between polls',
+      })
+def wait_vultr(ctx, subid=None, timeout=600, interval=5, max_interval=30):
+    """
+    Wait until servers are active, running and their state is ok
+    All servers are checked with a single server.list call per poll. Polls
+    get spaced out while nothing changes, and the task returns as soon as the
+    last server is ready
+    """
+    subids = set(subid.split(',')) if subid else None
+    # we do not want to display the result of the queries
+    query_ctx = Context()
+    query_ctx.config.run.echo = False
+    start = time.monotonic()
+    ready = OrderedDict()
+    done = set()
+    delay = interval
+    while True:
+        servers = server_list(query_ctx)
+        if servers is None:
+            # API key missing
+            return None
+        elapsed = time.monotonic() - start
+        pending = set(subids or []) - done
+        progress = False
+        for server in servers:
+            _subid = server['SUBID']
+            if _subid in done or (subids and _subid not in subids):
+                continue
+            if _is_ready(server):
+                label = server.get('label') or _subid
+                ready[label] = round(elapsed, 1)
+                done.add(_subid)
+                pending.discard(_subid)
+                progress = True
+                if ctx.config.run.echo:
+                    puts('%s ready after %.1fs' % (label, elapsed))
+            else:
+                pending.add(_subid)
+        if not pending:
+            break
+        if elapsed >= timeout:
+            msg = 'Timeout waiting for: %s' % ', '.join(sorted(pending))
+            raise RuntimeError(msg)
+        # poll quickly while servers are getting ready, back off otherwise
+        if progress:
+            delay = interval
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, max_interval)
+    if ctx.config.run.echo:
+        display_yaml({'Ready servers': dict(ready)})
+    return ready
+
+wait_coll = Collection()
+wait_coll.add_task(wait_vultr)
@@ -31,26 +31,53 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+from functools import partial
 from invoke import task, Collection
 from vps.console import display_yaml
 from vps.vultr.server import server_list, server_destroy
+from .batch import run_batch
+from .inventory import get_servers, invalidate
 
 
 @task(name='vultr',
-      help={})
-def wipe_vultr(ctx):
+      help={
+          'tag': 'Only destroy instances with this tag',
+          'label': 'Only destroy instances with this label',
+          'jobs': 'Number of instances destroyed in parallel. Only up to ' +
+          'VPS_HTTP_POOL_SIZE connections are kept alive',
+          'rate': 'Maximum number of destroy requests started per second',
+          'max_age': 'Reuse the servers fetched by a previous command ' +
+          '(see inventory.refresh) if not older than these seconds',
+      })
+def wipe_vultr(ctx, tag=None, label=None, jobs=1, rate=1.0, max_age=0):
     """
-    Destroy all instances in Vultr
+    Destroy all instances in Vultr, or those matching tag/label
     """
     wiped_servers = {}
-    servers = server_list(ctx)
+    failed_servers = {}
+    if max_age > 0:
+        servers = [s for s in get_servers(ctx, max_age) or []
+                   if tag in (None, s.get('tag')) and
+                   label in (None, s.get('label'))]
+    else:
+        servers = server_list(ctx, tag=tag, label=label)
     if servers:
-        for server in servers:
-            subid = server['SUBID']
-            server_destroy(ctx, subid)
-            wiped_servers[server['label']] = subid
+        destroy = partial(server_destroy, ctx)
+        items = [(server['SUBID'], server['SUBID']) for server in servers]
+        results, errors = run_batch(destroy, items, jobs, rate)
+        if results:
+            invalidate(ctx)
+        labels = {server['SUBID']: server['label'] for server in servers}
+        for subid in results:
+            wiped_servers[labels[subid]] = subid
+        for subid, e in errors.items():
+            failed_servers[labels[subid]] = {'SUBID': subid, 'error': str(e)}
     if ctx.config.run.echo:
-        display_yaml({'Wiped servers': wiped_servers})
+        display_yaml({'Wiped servers': wiped_servers,
+                      'Failed servers': failed_servers})
+    if failed_servers:
+        subids = [failed['SUBID'] for failed in failed_servers.values()]
+        raise RuntimeError('Failed to destroy: %s' % ', '.join(subids))
     return wiped_servers
 
 wipe_coll = Collection()
@@ -32,9 +32,9 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from vps.console import display_yaml
-from .key import get_key, require_key
+from .client import get_client
+from .key import require_key
 
 
 @task(name='info',
@@ -44,7 +44,7 @@ def account_info(ctx):
     """
     Retrieve information about the current account
     """
-    info = Vultr(get_key()).account.info()
+    info = get_client().account.info()
     if ctx.config.run.echo:
         display_yaml({'Account Info': info})
     return info
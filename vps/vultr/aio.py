@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from . import client
+from . import query as _query
+from . import server as _server
+
+
+async def to_thread(f, *args, **kwargs):
+    """
+    Runs a blocking call in the thread pool of the event loop, see run().
+    Requests still go through the pooled session of the shared client, so
+    many calls can be fanned out from a single event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(f, *args, **kwargs))
+
+
+async def query(ctx, q, criteria, **kwargs):
+    return await to_thread(_query.query, ctx, q, criteria, **kwargs)
+
+
+async def server_create(ctx, dcid, vpsplanid, osid, **kwargs):
+    return await to_thread(_server.server_create, ctx, dcid, vpsplanid, osid,
+                           **kwargs)
+
+
+async def server_destroy(ctx, subid):
+    return await to_thread(_server.server_destroy, ctx, subid)
+
+
+async def gather(aws, limit=None, return_exceptions=False):
+    """
+    Like asyncio.gather, but running at most limit awaitables at a time
+    """
+    if not limit:
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _bounded(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*[_bounded(aw) for aw in aws],
+                                return_exceptions=return_exceptions)
+
+
+def run(aw, workers=None):
+    """
+    Bridge for synchronous code: runs an awaitable in a new event loop,
+    whose calls to to_thread share up to workers threads. By default, as
+    many as connections can be reused by the session
+    """
+    async def _main():
+        executor = ThreadPoolExecutor(max_workers=workers or client._pool_size)
+        asyncio.get_running_loop().set_default_executor(executor)
+        return await aw
+    return asyncio.run(_main())
@@ -32,20 +32,21 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from .query import query
 
 
 @task(name='list',
       help={
-          'criteria': 'Filter queried data. Example usage: "{\'name\': \'WordPress\'}"'
+          'criteria': 'Filter queried data. Example usage: "{\'name\': \'WordPress\'}"',
+          'refresh': 'Ignore the cached response and query Vultr again',
       })
-def app_list(ctx, criteria=''):
+def app_list(ctx, criteria='', refresh=False):
     """
     Retrieve a list of available applications
     These refer to applications that can be launched when creating a Vultr VPS
     """
-    return query(ctx, lambda x: Vultr(x).app.list(), criteria)
+    return query(ctx, lambda v: v.app.list(), criteria,
+                 cache='app.list', refresh=refresh)
 
 
 app_coll = Collection()
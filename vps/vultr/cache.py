@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import fcntl
+import hashlib
+import json
+import os
+import os.path
+import tempfile
+import time
+from contextlib import contextmanager
+from vps.serializer import dumps, loads
+
+_cache_dir = os.path.join(os.path.expanduser('~'), '.vps', 'cache')
+
+# catalogs barely change, but plans and regions track availability
+_day = 24 * 60 * 60
+_default_ttl = {
+    'app.list': 7 * _day,
+    'os.list': 7 * _day,
+    'plans.list': _day,
+    'regions.list': _day,
+}
+
+
+def _settings(ctx):
+    """
+    Cache settings are taken from the task configuration. Contexts without a
+    cache section (e.g. the ones created internally by other tasks) skip it
+    """
+    return ctx.config.get('cache') or {}
+
+
+def _ttl(settings, endpoint):
+    ttl = settings.get('ttl') or {}
+    return ttl.get(endpoint, _default_ttl.get(endpoint, 0))
+
+
+def _path(settings, endpoint, params):
+    name = endpoint
+    if params:
+        # the standard library, for names not to depend on the JSON backend
+        encoded = json.dumps(params, sort_keys=True).encode('utf-8')
+        name += '-' + hashlib.sha1(encoded).hexdigest()[:12]
+    cache_dir = os.path.expanduser(settings.get('path') or _cache_dir)
+    return os.path.join(cache_dir, name + '.json')
+
+
+def _read(path, ttl):
+    try:
+        with open(path, 'rb') as f:
+            entry = loads(f.read())
+    except (IOError, ValueError):
+        return None
+    if time.time() - entry.get('created', 0) > ttl:
+        return None
+    return entry.get('data')
+
+
+def _write(path, data):
+    """
+    Writes to a temporary file that is then renamed, so readers never see a
+    half written entry
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(dumps({'created': time.time(), 'data': data}))
+        os.replace(tmp_path, path)
+    except:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def _lock(path):
+    with open(path + '.lock', 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load(ctx, endpoint, max_age, params=None):
+    """
+    Stored response of an endpoint, if it is not older than max_age seconds
+    """
+    settings = _settings(ctx)
+    if not settings.get('enabled') or max_age <= 0:
+        return None
+    return _read(_path(settings, endpoint, params), max_age)
+
+
+def store(ctx, endpoint, data, params=None):
+    """
+    Stores the response of an endpoint, for load() and cached() to find it
+    """
+    settings = _settings(ctx)
+    if not settings.get('enabled'):
+        return
+    path = _path(settings, endpoint, params)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write(path, data)
+
+
+def discard(ctx, endpoint, params=None):
+    """
+    Removes the stored response of an endpoint, i.e. after changing it
+    """
+    settings = _settings(ctx)
+    if not settings.get('enabled'):
+        return
+    try:
+        os.unlink(_path(settings, endpoint, params))
+    except FileNotFoundError:
+        pass
+
+
+def cached(ctx, endpoint, fetch, params=None, refresh=False):
+    """
+    Returns the response of fetch() for an endpoint, going through the on-disk
+    cache when it is enabled. Processes refreshing the same entry are
+    serialized, so only one of them queries Vultr
+    """
+    settings = _settings(ctx)
+    ttl = _ttl(settings, endpoint)
+    if not settings.get('enabled') or ttl <= 0:
+        return fetch()
+    path = _path(settings, endpoint, params)
+    if not refresh:
+        data = _read(path, ttl)
+        if data is not None:
+            return data
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock(path):
+        if not refresh:
+            # someone else may have refreshed the entry while we waited
+            data = _read(path, ttl)
+            if data is not None:
+                return data
+        data = fetch()
+        if data:
+            _write(path, data)
+    return data
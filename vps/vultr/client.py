@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os.path
+import random
+import threading
+import time
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from functools import partial
+from os import environ
+from vps.profiling import phase, timed
+from vps.serializer import loads
+from .key import get_key
+from .ratelimit import load_bucket
+from .stream import decode, iter_items
+
+# pool size should not be smaller than the number of parallel jobs
+_pool_size = int(environ.get('VPS_HTTP_POOL_SIZE', 10))
+_timeout = float(environ.get('VPS_HTTP_TIMEOUT', 60))
+# i.e. http://127.0.0.1:8080 to use the simulator in benchmarks/
+_endpoint = environ.get('VPS_API_ENDPOINT')
+# transient failures are retried, waiting up to _backoff * 2 ** attempt
+_retries = int(environ.get('VPS_HTTP_RETRIES', 4))
+_backoff = float(environ.get('VPS_HTTP_BACKOFF', 1))
+_max_backoff = float(environ.get('VPS_HTTP_MAX_BACKOFF', 30))
+# bytes read at once from streamed responses
+_chunk_size = int(environ.get('VPS_HTTP_CHUNK_SIZE', 64 * 1024))
+_transient = (500, 502, 503, 504)
+# rate shared by every process using the same API key, see load_bucket
+_ratelimit_cfg = environ.get('VPS_RATELIMIT', os.path.join(
+    os.path.expanduser('~'), '.vps', 'ratelimit'))
+
+_session = None
+_session_lock = threading.Lock()
+_clients = {}
+_limiters = {}
+
+
+def get_session():
+    """
+    Process wide HTTP session. Connections are kept alive and reused by every
+    client, saving a TLS handshake per request
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_pool_size,
+                                  pool_maxsize=_pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+
+def _delay(attempt, response=None):
+    """
+    Seconds to wait before the next attempt: Retry-After when Vultr sends it,
+    otherwise exponential backoff with full jitter, so that parallel jobs
+    hitting the rate limit at once do not retry at once
+    """
+    retry_after = response.headers.get('Retry-After') \
+        if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(retry_after)
+            return max(0.0, when.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(_max_backoff, _backoff * 2 ** attempt))
+
+
+def _unprocessed(response, error):
+    import requests
+    # Vultr rejects requests over the rate limit without processing them,
+    # and requests timing out while connecting never reached it
+    return (response is not None and response.status_code == 503) or \
+        isinstance(error, requests.ConnectTimeout)
+
+
+def _get_limiter(api_key):
+    if api_key not in _limiters:
+        _limiters[api_key] = load_bucket(_ratelimit_cfg, api_key)
+    return _limiters[api_key]
+
+
+def _request(send, idempotent, recover=None, limiter=None):
+    """
+    Calls send() until the response is not a transient failure, up to
+    _retries more times. Requests which are not idempotent are only repeated
+    when Vultr did not process them, or when recover() finds no trace of the
+    first attempt. Otherwise, recover() returns the response to use instead.
+    Every attempt takes a token from limiter first
+    """
+    import requests
+    for attempt in range(_retries + 1):
+        response, error = None, None
+        if limiter:
+            limiter.acquire()
+        try:
+            response = send()
+        except requests.RequestException as e:
+            error = e
+        else:
+            if response.status_code not in _transient:
+                return response
+        if attempt == _retries:
+            break
+        retry = idempotent or _unprocessed(response, error)
+        if not retry and recover:
+            recovered = recover()
+            if recovered is not None:
+                return recovered
+            retry = True
+        if not retry:
+            break
+        time.sleep(_delay(attempt, response))
+    if error is not None:
+        raise error
+    return response
+
+
+def _decoded(response):
+    # the vultr library decodes responses with response.json()
+    response.json = lambda **kwargs: loads(response.content)
+    return response
+
+
+def _get(api, session, url, params=None, stream=False):
+    if not isinstance(params, dict):
+        params = dict()
+    if api.api_key:
+        params['api_key'] = api.api_key
+    name = 'GET ' + url[len(api.api_endpoint):]
+    # streamed responses are timed by stream(), until the body is read
+    with nullcontext() if stream else phase(name):
+        return _decoded(_request(lambda: session.get(url, params=params,
+                                                     timeout=_timeout,
+                                                     stream=stream),
+                                 True, limiter=_get_limiter(api.api_key)))
+
+
+def _find_created(api, session, url, label):
+    """
+    Called when server.create failed: if no server has this label, nothing
+    was created and the request can be sent again. Otherwise, the server may
+    have been created by the request or have existed before, which can not
+    be told apart, so it fails instead of creating a duplicate or reporting
+    someone else's server as created
+    """
+    import requests
+    list_url = url.replace('/server/create', '/server/list')
+    servers = _get(api, session, list_url, {'label': label})
+    if servers.status_code != 200:
+        # retrying blindly could create the server twice
+        raise requests.RequestException('Unable to check whether server %s '
+                                        'was created' % label)
+    # Vultr answers [] instead of {} when there are no servers
+    found = (servers.json() if servers.text else None) or {}
+    subids = sorted(server['SUBID'] for server in found.values()
+                    if server.get('label') == label)
+    if subids:
+        raise requests.RequestException(
+            'Creating server %s failed, but servers with that label exist '
+            '(%s): check whether it was created before trying again' %
+            (label, ', '.join(subids)))
+    return None
+
+
+def _post(api, session, url, params=None):
+    query = {'api_key': api.api_key} if api.api_key else {}
+    recover = None
+    if url.endswith('/server/create') and params and params.get('label'):
+        # the server may exist even though the request failed: creating it
+        # again would end up with two servers with the same label. Only
+        # checked once a request fails, so that creates cost one request
+        recover = partial(_find_created, api, session, url, params['label'])
+    with phase('POST ' + url[len(api.api_endpoint):]):
+        return _decoded(_request(lambda: session.post(url, params=query,
+                                                      data=params,
+                                                      timeout=_timeout),
+                                 False, recover, _get_limiter(api.api_key)))
+
+
+def stream(api, path, params=None):
+    """
+    Like api.request(path, params) for GET requests, but yields the (key,
+    value) pairs of the JSON object answered as they are received, instead
+    of waiting for the whole response
+    """
+    return timed('GET ' + path, _stream_items(api, path, params))
+
+
+def _stream_items(api, path, params):
+    import requests
+    from vultr.utils import VultrError
+    url = api.api_endpoint + path
+    try:
+        response = _get(api, get_session(), url, dict(params or {}), True)
+        with response:
+            if response.status_code != 200:
+                raise VultrError('Request failed with HTTP %d. Body: \n%s' %
+                                 (response.status_code, response.text))
+            chunks = response.iter_content(_chunk_size)
+            yield from iter_items(decode(chunks, response.encoding or 'utf-8'))
+    except requests.RequestException as e:
+        # as the vultr library does
+        raise RuntimeError(e)
+
+
+def _apis(api):
+    from vultr.utils import VultrBase
+    yield api
+    for value in vars(api).values():
+        if isinstance(value, VultrBase):
+            yield from _apis(value)
+
+
+def _new_client(api_key, session):
+    """
+    Vultr client whose requests, including the ones of nested APIs
+    (i.e. server.ipv4), go through the shared session
+    """
+    # vultr pulls requests in, so it is only imported when needed
+    from vultr import Vultr
+    client = Vultr(api_key)
+    for api in list(_apis(client)):
+        if _endpoint:
+            api.api_endpoint = _endpoint.rstrip('/')
+        api._request_get_helper = partial(_get, api, session)
+        api._request_post_helper = partial(_post, api, session)
+    return client
+
+
+def get_client():
+    """
+    Returns the Vultr client for the current API key. Tasks should always use
+    it instead of creating their own Vultr instances
+    """
+    key = get_key()
+    client = _clients.get(key)
+    if client is None:
+        client = _clients[key] = _new_client(key, get_session())
+    return client
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import operator
+import re
+from ast import literal_eval
+from functools import lru_cache
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ordered(op):
+    def _compile(operand):
+        number = _number(operand)
+        if number is None:
+            # i.e. dates, compared as text
+            return lambda x: x is not None and op(str(x), operand)
+
+        def _test(x):
+            n = _number(x)
+            return n is not None and op(n, number)
+        return _test
+    return _compile
+
+
+def _in(operand):
+    try:
+        values = frozenset(operand)
+    except TypeError:
+        values = list(operand)
+
+    def _test(x):
+        try:
+            return x in values
+        except TypeError:
+            return False
+    return _test
+
+
+def _regex(operand):
+    search = re.compile(operand).search
+    return lambda x: x is not None and search(str(x)) is not None
+
+
+def _prefix(operand):
+    return lambda x: x is not None and str(x).startswith(operand)
+
+
+_operators = {
+    '==': lambda v: lambda x: x == v,
+    '!=': lambda v: lambda x: x != v,
+    'in': _in,
+    '<': _ordered(operator.lt),
+    '<=': _ordered(operator.le),
+    '>': _ordered(operator.gt),
+    '>=': _ordered(operator.ge),
+    're': _regex,
+    'prefix': _prefix,
+}
+
+
+def index(rows, key):
+    """
+    Hash index of rows by the value of key. Returns None when the values can
+    not be hashed (i.e. lists)
+    """
+    buckets = {}
+    try:
+        for row in rows:
+            buckets.setdefault(row.get(key), []).append(row)
+    except TypeError:
+        return None
+    return buckets
+
+
+class Criteria(object):
+    """
+    Criteria compiled into a single predicate. Plain values are compared for
+    equality, while dicts map operators to operands:
+    {'label': {'prefix': 'web'}, 'ram': {'>=': 1024}, 'DCID': {'in': ['1', '9']}}
+    Supported operators: ==, !=, in, <, <=, >, >=, re, prefix
+    """
+
+    def __init__(self, criteria):
+        self.criteria = criteria
+        self.equalities = {}
+        # (key, operator, operand, test), i.e. for ResultSet.select
+        self.terms = []
+        for k, v in criteria.items():
+            if isinstance(v, dict):
+                for op, operand in v.items():
+                    if op not in _operators:
+                        raise ValueError('Unknown operator %s in criteria for %s' % (op, k))
+                    self.terms.append((k, op, operand, _operators[op](operand)))
+                    if op == '==':
+                        self.equalities[k] = operand
+            else:
+                self.terms.append((k, '==', v, _operators['=='](v)))
+                self.equalities[k] = v
+        self.predicate = self._compile([(k, t) for k, _, _, t in self.terms])
+
+    def _compile(self, tests):
+        if not tests:
+            return lambda row: True
+        if len(tests) == 1:
+            (k, test), = tests
+            return lambda row: test(row.get(k))
+        return lambda row: all(test(row.get(k)) for k, test in tests)
+
+    def __call__(self, row):
+        return self.predicate(row)
+
+    def pushdown(self, keys):
+        """
+        Equalities on keys, which the API can apply itself to send less data.
+        They are still checked locally: the API ignores empty values, and its
+        matching may differ from ours. Empty or zero values are not pushed
+        """
+        pushed = {}
+        for k, v in self.criteria.items():
+            value = v.get('==') if isinstance(v, dict) else v
+            if k in keys and value and \
+                    isinstance(value, (str, int, float)) and \
+                    not isinstance(value, bool):
+                pushed[k] = value
+        return pushed
+
+    def select(self, rows, indexes=None):
+        """
+        Returns the rows matching the criteria, in a single pass. indexes maps
+        keys to the buckets built by index(); when one of the equalities is
+        indexed, only its bucket is scanned
+        """
+        candidates = rows
+        for k, v in self.equalities.items():
+            buckets = (indexes or {}).get(k)
+            if buckets is None:
+                continue
+            try:
+                bucket = buckets.get(v, [])
+            except TypeError:
+                continue
+            if candidates is rows or len(bucket) < len(candidates):
+                candidates = bucket
+        return list(filter(self.predicate, candidates))
+
+
+@lru_cache(maxsize=128)
+def _compile_text(text):
+    return Criteria(literal_eval(text))
+
+
+def compile_criteria(criteria):
+    """
+    Compiles criteria given as a dict or as its string representation. The
+    latter are cached, as they usually come from the command line
+    """
+    if isinstance(criteria, str):
+        return _compile_text(criteria)
+    return Criteria(criteria)
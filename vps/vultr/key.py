@@ -32,8 +32,8 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import inspect
-from clint.textui import puts, colored
 from os import environ
+from vps.console import puts
 
 # Missing key is already being handled by vultr library
 _api_key = environ.get('VULTR_KEY')
@@ -58,6 +58,7 @@ def require_key(f):
         if _api_key:
             return f(ctx, *args, **kwargs)
         elif ctx.config.run.echo:
+            from clint.textui import colored
             puts("'%s' missing" % colored.red('VULTR_KEY'))
 
     _f.__doc__ = inspect.getdoc(f)
@@ -32,20 +32,21 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from .query import query
 
 
 @task(name='list',
       help={
           'criteria': 'Filter queried data. Example usage: ' +
-          '"{\'family\': \'ubuntu\'}"'
+          '"{\'family\': \'ubuntu\'}"',
+          'refresh': 'Ignore the cached response and query Vultr again',
       })
-def os_list(ctx, criteria=''):
+def os_list(ctx, criteria='', refresh=False):
     """
     Retrieve a list of available operating systems
     """
-    return query(ctx, lambda x: Vultr(x).os.list(), criteria)
+    return query(ctx, lambda v: v.os.list(), criteria,
+                 cache='os.list', refresh=refresh)
 
 
 os_coll = Collection()
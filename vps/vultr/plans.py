@@ -32,7 +32,6 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from .params import param_dict
 from .query import query
 
@@ -41,14 +40,16 @@ from .query import query
       help={
           'criteria': 'Filter queried data. Example usage: "{\'plan_type\': \'SSD\'}"',
           '_type': 'The type of plans to return. Possible values: "all", "vc2", "ssd", "vdc2", "dedicated"',
+          'refresh': 'Ignore the cached response and query Vultr again',
       })
-def plans_list(ctx, criteria='', _type=None):
+def plans_list(ctx, criteria='', _type=None, refresh=False):
     """
     Retrieve a list of all active plans.
     Plans that are no longer available will not be shown.
     """
     params = param_dict(_type=_type)
-    return query(ctx, lambda x: Vultr(x).plans.list(params), criteria)
+    return query(ctx, lambda v: v.plans.list(params), criteria,
+                 cache='plans.list', params=params, refresh=refresh)
 
 plans_coll = Collection()
 plans_coll.add_task(plans_list)
@@ -31,29 +31,106 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from ast import literal_eval
-from vps.console import display
-from .key import get_key
+from itertools import chain
+from os import environ
+from vps.console import display, display_empty, get_format
+from .cache import cached
+from .client import get_client, stream as _stream
+from .criteria import compile_criteria
+from .resultset import ResultSet
 
+# results with at least this many rows are returned as a ResultSet, 0 never
+_columnar_rows = int(environ.get('VPS_COLUMNAR_ROWS', 0))
 
-def query(ctx, q, criteria):
+
+def _rows(result):
+    """
+    List endpoints return objects by id, but a single object when filtered
+    by id (i.e. server.list with SUBID)
+    """
+    if all(isinstance(v, dict) for v in result.values()):
+        return list(result.values())
+    return [result]
+
+
+def _keep(rows, kept):
+    for row in rows:
+        kept.append(row)
+        yield row
+
+
+def _streamed(ctx, path, params, criteria):
+    """
+    Rows of the response of path, filtered and displayed while they are
+    received. Only the rows selected are kept
+    """
+    rows = (row for _, row in _stream(get_client(), path, params))
+    received = next(rows, None)
+    # the fields of the first row received head an empty csv
+    headers = ()
+    if received is not None:
+        headers = received.keys()
+        rows = chain([received], rows)
+    if criteria:
+        rows = filter(criteria, rows)
+    first = next(rows, None)
+    if first is None:
+        if ctx.config.run.echo:
+            display_empty(get_format(ctx), headers)
+        return []
+    rows = chain([first], rows)
+    if not ctx.config.run.echo:
+        return list(rows)
+    selected = []
+    display(_keep(rows, selected), get_format(ctx))
+    return selected
+
+
+def query(ctx, q, criteria, cache=None, params=None, refresh=False,
+          pushdown=None, stream=None):
     """
     Query a Vultr endpoint
+    Responses of endpoints named by cache are stored on disk, keyed by params.
+    pushdown lists the fields the endpoint can filter by: equalities on them
+    found in criteria are added to params, and q is called with them as
+    q(client, params). The whole criteria are still applied locally.
+    Endpoints not cached can give their path as stream (i.e. /v1/server/list)
+    for the response to be parsed, filtered and displayed as it is received,
+    instead of calling q. Large results are returned as a ResultSet when
+    enabled with VPS_COLUMNAR_ROWS. See vps.vultr.criteria for the operators
+    supported by criteria
     """
-    result = q(get_key())
+    compiled = compile_criteria(criteria) if criteria else None
+    if pushdown is not None:
+        params = dict(params or {})
+        if compiled:
+            # explicit params take precedence over criteria
+            keys = [k for k in pushdown if k not in params]
+            params.update(compiled.pushdown(keys))
+        fetch = lambda: q(get_client(), params)
+    else:
+        fetch = lambda: q(get_client())
+    if stream and not cache:
+        result = _streamed(ctx, stream, params, compiled)
+        if _columnar_rows and len(result) >= _columnar_rows:
+            result = ResultSet(result)
+        return result
+    if cache:
+        result = cached(ctx, cache, fetch, params, refresh)
+    else:
+        result = fetch()
+    headers = ()
     if result:
-        result = list(result.values())
-        if criteria:
-            if isinstance(criteria, str):
-                criteria = literal_eval(criteria)
-
-            def _filter(a_dict):
-                for k, v in criteria.items():
-                    if (v and not a_dict.get(k)) or a_dict.get(k) != v:
-                        return False
-                return True
-
-            result = list(filter(_filter, result))
+        result = _rows(result)
+        headers = result[0].keys()
+        if _columnar_rows and len(result) >= _columnar_rows:
+            result = ResultSet(result)
+            if compiled:
+                result = result.select(compiled)
+        elif compiled:
+            result = compiled.select(result)
         if result and ctx.config.run.echo:
-            display(result)
+            display(result, get_format(ctx))
+    if not result and ctx.config.run.echo:
+        display_empty(get_format(ctx), headers)
     return result
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import fcntl
+import hashlib
+import json
+import os
+import os.path
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket: rate tokens are added per second, up to burst.
+    Each request takes one token, waiting for it if the bucket is empty
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+            # the token is reserved right away, so waiting threads queue up
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class SharedTokenBucket(object):
+    """
+    Token bucket whose state lives in a file, so that every process using the
+    same file (i.e. the same API key) shares the rate. Tokens are reserved
+    while holding a lock on the file, and waited for once it is released
+    """
+
+    def __init__(self, path, rate, burst=1):
+        self.path = path
+        self.rate = float(rate)
+        self.burst = burst
+
+    def _reserve(self, f):
+        now = time.time()
+        try:
+            state = json.loads(f.read() or '{}')
+        except ValueError:
+            state = {}
+        tokens = state.get('tokens', float(self.burst))
+        elapsed = max(0.0, now - state.get('updated', now))
+        tokens = min(self.burst, tokens + elapsed * self.rate) - 1
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps({'tokens': tokens, 'updated': now}))
+        f.flush()
+        return -tokens / self.rate if tokens < 0 else 0
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                wait = self._reserve(f)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        if wait:
+            time.sleep(wait)
+
+
+def load_bucket(cfg_path, api_key):
+    """
+    Shared bucket for an API key, configured in cfg_path:
+        rate: 2     # requests per second, for all processes
+        burst: 2    # requests allowed at once
+    Returns None when the file does not exist, i.e. no client side limit
+    """
+    if not os.path.isfile(cfg_path):
+        return None
+    from ruamel.yaml import YAML
+    with open(cfg_path, 'r') as f:
+        cfg = YAML(typ='safe').load(f) or {}
+    if not cfg.get('rate'):
+        return None
+    digest = hashlib.sha1((api_key or '').encode('utf-8')).hexdigest()[:12]
+    path = '%s.%s.state' % (cfg_path, digest)
+    return SharedTokenBucket(path, cfg['rate'], cfg.get('burst', 1))
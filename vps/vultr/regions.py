@@ -32,22 +32,23 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from .query import query
 
 
 @task(name='list',
       help={
           'criteria': 'Filter queried data. Example usage: ' +
-          '"{\'continent\': \'Europe\'}"'
+          '"{\'continent\': \'Europe\'}"',
+          'refresh': 'Ignore the cached response and query Vultr again',
       })
-def regions_list(ctx, criteria=''):
+def regions_list(ctx, criteria='', refresh=False):
     """
     Retrieve a list of all active regions
     Note that just because a region is listed here, does not mean that there is
     room for new servers
     """
-    return query(ctx, lambda x: Vultr(x).regions.list(), criteria)
+    return query(ctx, lambda v: v.regions.list(), criteria,
+                 cache='regions.list', refresh=refresh)
 
 
 regions_coll = Collection()
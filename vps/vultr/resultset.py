@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import math
+import operator
+import sys
+from array import array
+from collections.abc import Mapping
+from .criteria import _number
+
+# marks the rows without a field, which are not the same as rows with None
+_missing = object()
+
+_comparisons = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _intern(value):
+    # the same few values (i.e. status, DCID, os) repeat in every row
+    return sys.intern(value) if type(value) is str else value
+
+
+def _float(value):
+    if value is _missing:
+        return math.nan
+    number = _number(value)
+    return math.nan if number is None else number
+
+
+class _Columns(object):
+    """
+    Values by field, shared by a result set and the ones derived from it
+    """
+    __slots__ = ('values', 'count', 'plain', 'numbers')
+
+    def __init__(self, values, count):
+        self.values = values
+        self.count = count
+        # columns with None instead of _missing, and parsed into numbers
+        self.plain = {}
+        self.numbers = {}
+
+
+class Row(Mapping):
+    """
+    Read only, dict like view of a row of a ResultSet
+    """
+    __slots__ = ('_values', '_position')
+
+    def __init__(self, values, position):
+        self._values = values
+        self._position = position
+
+    def __getitem__(self, key):
+        value = self._values[key][self._position]
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        column = self._values.get(key)
+        if column is None:
+            return default
+        value = column[self._position]
+        return default if value is _missing else value
+
+    def __iter__(self):
+        position = self._position
+        return (k for k, column in self._values.items()
+                if column[position] is not _missing)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ResultSet(object):
+    """
+    Compact sequence of rows, stored as one list per field instead of one
+    dict per row. Strings are interned, numbers are parsed once per field
+    when a comparison or a sort needs them, and filtering and sorting go a
+    column at a time. Rows are read through dict like Row views
+    """
+    __slots__ = ('_columns', '_index')
+
+    def __init__(self, rows=(), _columns=None, _index=None):
+        if _columns is None:
+            values = {}
+            count = 0
+            for row in rows:
+                for k, v in row.items():
+                    column = values.get(k)
+                    if column is None:
+                        column = values[k] = [_missing] * count
+                    column.append(_intern(v))
+                count += 1
+                for column in values.values():
+                    if len(column) < count:
+                        column.append(_missing)
+            _columns = _Columns(values, count)
+            _index = range(count)
+        self._columns = _columns
+        self._index = _index
+
+    def _derive(self, index):
+        return ResultSet(_columns=self._columns, _index=index)
+
+    @property
+    def fields(self):
+        return list(self._columns.values)
+
+    def _plain(self, field):
+        columns = self._columns
+        column = columns.plain.get(field)
+        if column is None:
+            values = columns.values.get(field)
+            if values is None:
+                column = [None] * columns.count
+            else:
+                column = [None if v is _missing else v for v in values]
+            columns.plain[field] = column
+        return column
+
+    def column(self, field):
+        """
+        Values of field, with None for the rows without it
+        """
+        column = self._plain(field)
+        return [column[i] for i in self._index]
+
+    def numbers(self, field):
+        """
+        Values of field as floats, NaN where they are not numbers. Parsed on
+        first use, for all the rows sharing the columns
+        """
+        numbers = self._columns.numbers.get(field)
+        if numbers is None:
+            numbers = array('d', map(_float, self._plain(field)))
+            self._columns.numbers[field] = numbers
+        return numbers
+
+    def select(self, criteria):
+        """
+        Rows matching the compiled criteria. Each term is tested on its
+        column, over the rows kept by the previous terms only
+        """
+        selected = self._index
+        for k, op, operand, test in criteria.terms:
+            if not selected:
+                break
+            number = _number(operand) if op in _comparisons else None
+            if number is not None:
+                # NaN compares false, as non numbers do in Criteria
+                compare = _comparisons[op]
+                values = self.numbers(k)
+                selected = [i for i in selected if compare(values[i], number)]
+            else:
+                values = self._plain(k)
+                selected = [i for i in selected if test(values[i])]
+        return self._derive(list(selected))
+
+    def sort(self, field, reverse=False, numeric=False):
+        """
+        Rows ordered by field, as numbers or as text. Rows without it, or
+        not numeric when sorting as numbers, go last
+        """
+        if numeric:
+            values = self.numbers(field)
+            present = [i for i in self._index if not math.isnan(values[i])]
+            key = values.__getitem__
+        else:
+            values = self._plain(field)
+            present = [i for i in self._index if values[i] is not None]
+            key = lambda i: str(values[i])
+        kept = set(present)
+        last = [i for i in self._index if i not in kept]
+        return self._derive(sorted(present, key=key, reverse=reverse) + last)
+
+    def to_list(self):
+        """
+        Rows as plain dicts, i.e. to be serialized
+        """
+        return [dict(row) for row in self]
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        values = self._columns.values
+        return (Row(values, i) for i in self._index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._derive(self._index[i])
+        return Row(self._columns.values, self._index[i])
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and \
+                all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'ResultSet(%r)' % self.to_list()
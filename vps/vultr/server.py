@@ -32,10 +32,10 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from vps.console import display_yaml
 from .params import param_dict
-from .key import get_key, require_key
+from .client import get_client
+from .key import require_key
 from .query import query
 
 
@@ -62,7 +62,10 @@ def server_list(ctx, subid=None, tag=None, label=None, main_ip=None, criteria=''
     fields are deprecated in favor of "v6_networks".
     """
     params = param_dict(tag=tag, label=label, main_ip=main_ip)
-    return query(ctx, lambda x: Vultr(x).server.list(subid=subid, params=params), criteria)
+    # with SUBID, the response is that server instead of a list
+    return query(ctx, lambda v, p: v.server.list(subid=subid, params=p),
+                 criteria, params=params, pushdown=('tag', 'label', 'main_ip'),
+                 stream=None if subid else '/v1/server/list')
 
 
 @task(name='create',
@@ -134,7 +137,7 @@ def server_create(ctx, dcid, vpsplanid, osid, ipxe_chain_url=None,
                         tag=tag,
                         firewallgroupid=firewallgroupid,
                         )
-    vultr = Vultr(get_key())
+    vultr = get_client()
     response = vultr.server.create(dcid, vpsplanid, osid, params or None)
     if ctx.config.run.echo:
         display_yaml(response)
@@ -153,7 +156,7 @@ def server_destroy(ctx, subid):
     All data will be permanently lost, and the IP address will be released.
     There is no going back from this call
     """
-    vultr = Vultr(get_key())
+    vultr = get_client()
     return vultr.server.destroy(subid)
 
 
@@ -32,7 +32,6 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from .key import require_key
 from .params import param_dict
 from .query import query
@@ -49,7 +48,9 @@ def snapshot_list(ctx, snapshotid=None, criteria=''):
     List all snapshots on the current account
     """
     params = param_dict(snapshotid=snapshotid)
-    return query(ctx, lambda x: Vultr(x).snapshot.list(params), criteria)
+    return query(ctx, lambda v, p: v.snapshot.list(p), criteria,
+                 params=params, pushdown=('SNAPSHOTID',),
+                 stream='/v1/snapshot/list')
 
 
 snapshot_coll = Collection()
@@ -32,7 +32,6 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
-from vultr import Vultr
 from .key import require_key
 from .query import query
 
@@ -47,7 +46,7 @@ def sshkey_list(ctx, criteria=''):
     """
     List all the SSH keys on the current account
     """
-    return query(ctx, lambda x: Vultr(x).sshkey.list(), criteria)
+    return query(ctx, lambda v: v.sshkey.list(), criteria)
 
 
 sshkey_coll = Collection()
@@ -32,13 +32,21 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from invoke import task, Collection
+import hashlib
+import json
+import os
 import os.path
-from vultr import Vultr
 from vps.console import display_yaml
+from vps.files import read_text, replace
 from .params import param_dict
+from .client import get_client
 from .key import get_key, require_key
 from .query import query
 
+# hashes of the scripts synced, by account and directory
+_manifest_path = os.path.join(os.path.expanduser('~'), '.vps',
+                              'startupscripts.json')
+
 
 @task(name='list',
       help={
@@ -53,7 +61,7 @@ def startupscript_list(ctx, criteria=''):
     the first boot.
     Scripts of type "pxe" are executed by iPXE when the server itself starts up
     """
-    return query(ctx, lambda x: Vultr(x).startupscript.list(), criteria)
+    return query(ctx, lambda v: v.startupscript.list(), criteria)
 
 
 def _read_script(path):
@@ -72,7 +80,7 @@ def startupscript_create(ctx, name, script, _type=None):
     """
     Create a startup script
     """
-    vultr = Vultr(get_key())
+    vultr = get_client()
     if os.path.exists(script):
         script = _read_script(script)
     params = param_dict(_type=_type)
@@ -91,7 +99,7 @@ def startupscript_destroy(ctx, scriptid):
     """
     Remove a startup script
     """
-    vultr = Vultr(get_key())
+    vultr = get_client()
     return vultr.startupscript.destroy(scriptid)
 
 
@@ -106,15 +114,144 @@ def startupscript_update(ctx, scriptid, name='', script=''):
     """
     Update an existing startup script
     """
-    vultr = Vultr(get_key())
+    vultr = get_client()
     if os.path.exists(script):
         script = _read_script(script)
     params = param_dict(name=name, script=script)
     return vultr.startupscript.update(scriptid, params)
 
 
+def _sha1(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _script_type(script):
+    return 'pxe' if script.startswith('#!ipxe') else 'boot'
+
+
+def _local_scripts(directory):
+    """
+    Scripts in a directory, by file name. Hidden files are skipped
+    """
+    scripts = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.startswith('.') and os.path.isfile(path):
+            scripts[name] = _read_script(path)
+    return scripts
+
+
+def _load_manifest(key):
+    try:
+        return json.loads(read_text(_manifest_path) or '{}').get(key, {})
+    except ValueError:
+        return {}
+
+
+def _save_manifest(key, manifest):
+    try:
+        manifests = json.loads(read_text(_manifest_path) or '{}')
+    except ValueError:
+        manifests = {}
+    manifests[key] = manifest
+    replace(_manifest_path, json.dumps(manifests, indent=2, sort_keys=True),
+            0o600)
+
+
+def _plan_sync(scripts, remote, manifest):
+    """
+    Splits the local scripts into unchanged ones, updates and creates.
+    Scripts recorded in the manifest with the same hash, and not modified
+    remotely since, are unchanged without looking at their remote content
+    """
+    by_name = {r['name']: r for r in remote.values()}
+    unchanged, updates, creates = {}, {}, {}
+    for name, script in scripts.items():
+        digest = _sha1(script)
+        recorded = manifest.get(name) or {}
+        current = remote.get(recorded.get('SCRIPTID')) or by_name.get(name)
+        if current is None:
+            creates[name] = script
+        elif recorded.get('sha1') == digest and \
+                recorded.get('SCRIPTID') == current['SCRIPTID'] and \
+                recorded.get('date_modified') == current.get('date_modified'):
+            unchanged[name] = recorded
+        elif _sha1(current.get('script', '')) == digest and \
+                current.get('name') == name:
+            unchanged[name] = {'SCRIPTID': current['SCRIPTID'], 'sha1': digest,
+                               'date_modified': current.get('date_modified')}
+        else:
+            updates[name] = (current['SCRIPTID'], script)
+    return unchanged, updates, creates
+
+
+@task(name='sync',
+      help={
+          'directory': 'Directory with one startup script per file, named ' +
+          'as the file',
+          'jobs': 'Number of scripts created or updated in parallel',
+      })
+@require_key
+def startupscript_sync(ctx, directory, jobs=4):
+    """
+    Create or update the startup scripts of a directory
+    Remote scripts are listed once, and only new or modified scripts are
+    sent, in parallel. Hashes of the synced scripts are kept in
+    ~/.vps/startupscripts.json, so unchanged scripts are skipped without
+    comparing their content. Scripts starting with #!ipxe are of type pxe.
+    Remote scripts without a local file are left untouched
+    """
+    from . import aio
+    vultr = get_client()
+    directory = os.path.abspath(os.path.expanduser(directory))
+    key = '%s:%s' % (_sha1(get_key())[:12], directory)
+    scripts = _local_scripts(directory)
+    remote = vultr.startupscript.list() or {}
+    manifest = _load_manifest(key)
+    unchanged, updates, creates = _plan_sync(scripts, remote, manifest)
+
+    def _create(name):
+        script = scripts[name]
+        params = {'type': _script_type(script)}
+        return vultr.startupscript.create(name, script, params)['SCRIPTID']
+
+    def _update(name):
+        scriptid, script = updates[name]
+        vultr.startupscript.update(scriptid, {'name': name, 'script': script})
+        return scriptid
+
+    names = list(creates) + list(updates)
+    aws = [aio.to_thread(_create if name in creates else _update, name)
+           for name in names]
+    outcomes = aio.run(aio.gather(aws, limit=max(1, jobs),
+                                  return_exceptions=True),
+                       workers=max(1, jobs))
+    new_manifest = dict(unchanged)
+    failed = {}
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, Exception):
+            failed[name] = str(outcome)
+        else:
+            # date_modified is picked up by the next sync
+            new_manifest[name] = {'SCRIPTID': str(outcome),
+                                  'sha1': _sha1(scripts[name])}
+    _save_manifest(key, new_manifest)
+    result = {
+        'Created scripts': sorted(n for n in creates if n not in failed),
+        'Updated scripts': sorted(n for n in updates if n not in failed),
+        'Unchanged scripts': sorted(unchanged),
+        'Failed scripts': failed,
+    }
+    if ctx.config.run.echo:
+        display_yaml(result)
+    if failed:
+        raise RuntimeError('Failed to sync: %s' % ', '.join(sorted(failed)))
+    return result
+
+
 startupscript_coll = Collection()
 startupscript_coll.add_task(startupscript_create)
 startupscript_coll.add_task(startupscript_destroy)
 startupscript_coll.add_task(startupscript_list)
+startupscript_coll.add_task(startupscript_sync)
 startupscript_coll.add_task(startupscript_update)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016, Germán Fuentes Capella <development@fuentescapella.com>
+# BSD 3-Clause License
+#
+# Copyright (c) 2017, Germán Fuentes Capella
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holder nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import codecs
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+# consumed text is dropped from the buffer once it grows over this size
+_compact_size = 64 * 1024
+
+
+def decode(chunks, encoding='utf-8'):
+    """
+    Text of chunks of bytes, even when they split multibyte characters
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+class _Buffer(object):
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = ''
+        self.pos = 0
+        self.complete = False
+
+    def more(self):
+        """
+        Appends the next chunk, returning False when there are no more
+        """
+        if self.complete:
+            return False
+        for chunk in self.chunks:
+            if self.pos > _compact_size:
+                self.text = self.text[self.pos:]
+                self.pos = 0
+            self.text += chunk
+            return True
+        self.complete = True
+        return False
+
+    def peek(self):
+        """
+        Next character that is not whitespace, or '' at the end of the text
+        """
+        while True:
+            self.pos = _whitespace.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                return ''
+
+    def expect(self, chars):
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError('Expecting one of %r at %d, found %r' %
+                             (chars, self.pos, c or 'end of data'))
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except ValueError:
+                # the value may be incomplete
+                if not self.more():
+                    raise
+                continue
+            # numbers and literals are only complete when followed by
+            # something else, i.e. 12 may be the start of 123
+            if end < len(self.text) or not self.more():
+                self.pos = end
+                return value
+
+
+def iter_items(chunks):
+    """
+    Incremental parser of a JSON object given as chunks of text. Yields its
+    (key, value) pairs as soon as each of them is complete, or (index, value)
+    pairs for an array, i.e. the [] Vultr answers when a list is empty.
+    Like an empty object, empty text yields nothing. Only the value being
+    parsed is kept in memory
+    """
+    buffer = _Buffer(chunks)
+    if not buffer.peek():
+        return
+    close = '}' if buffer.expect('{[') == '{' else ']'
+    if buffer.peek() == close:
+        buffer.pos += 1
+        return
+    i = 0
+    while True:
+        if close == '}':
+            key = buffer.value()
+            if not isinstance(key, str):
+                raise ValueError('Expecting a key at %d' % buffer.pos)
+            buffer.expect(':')
+        else:
+            key = i
+        yield key, buffer.value()
+        i += 1
+        if buffer.expect(',' + close) == close:
+            return
@@ -56,5 +56,8 @@ collection.add_collection(startupscript_coll, name='startupscript')
 collection.configure({
     'run': {
         'echo': True
+    },
+    'cache': {
+        'enabled': True
     }
 })